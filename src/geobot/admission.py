@@ -0,0 +1,63 @@
+import time
+from collections.abc import Callable
+
+
+class AdmissionControl:
+    """Decides whether an expensive command may run now.
+
+    A command is refused while the same user or channel is still on cooldown for it, or
+    while `max_concurrent` expensive commands are already running. Refused commands
+    never queue, the caller is expected to answer them with something cheap instead.
+    """
+
+    def __init__(
+        self,
+        user_cooldown: float = 30.0,
+        channel_cooldown: float = 10.0,
+        max_concurrent: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.user_cooldown = user_cooldown
+        self.channel_cooldown = channel_cooldown
+        self.max_concurrent = max_concurrent
+        self.active = 0
+
+        self._clock = clock
+        self._user_last_run: dict[tuple[str, int], float] = {}
+        self._channel_last_run: dict[tuple[str, int], float] = {}
+
+    def try_admit(self, command: str, user_id: int, channel_id: int) -> bool:
+        """Admit a command, or return False if it should get a cheap reply. Admitted commands must call release()."""
+        now = self._clock()
+        if self.active >= self.max_concurrent:
+            return False
+        if self._on_cooldown(self._user_last_run, (command, user_id), self.user_cooldown, now):
+            return False
+        if self._on_cooldown(self._channel_last_run, (command, channel_id), self.channel_cooldown, now):
+            return False
+
+        self._prune(now)
+        self._user_last_run[(command, user_id)] = now
+        self._channel_last_run[(command, channel_id)] = now
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active = max(self.active - 1, 0)
+
+    @staticmethod
+    def _on_cooldown(
+        last_runs: dict[tuple[str, int], float], key: tuple[str, int], cooldown: float, now: float
+    ) -> bool:
+        last_run = last_runs.get(key)
+        return last_run is not None and now - last_run < cooldown
+
+    def _prune(self, now: float) -> None:
+        # Forget keys whose cooldown has expired so the maps don't grow with every user seen
+        for last_runs, cooldown in [
+            (self._user_last_run, self.user_cooldown),
+            (self._channel_last_run, self.channel_cooldown),
+        ]:
+            expired = [key for key, last_run in last_runs.items() if now - last_run >= cooldown]
+            for key in expired:
+                del last_runs[key]
@@ -0,0 +1,110 @@
+import numpy as np
+
+from .db import Database
+
+MAX_ROUND_SCORE = 5000
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class ScoreAnalytics:
+    """Keeps every round score in NumPy arrays for vectorized distribution and difficulty queries.
+
+    The first refresh bulk-loads the scores table, including archived seasons. Later
+    refreshes only append rows with a higher id, so keeping up to date costs nothing
+    when no new scores have arrived.
+    """
+
+    def __init__(self) -> None:
+        self.scores = np.empty(0, dtype=np.int32)
+        self.rounds = np.empty(0, dtype=np.int8)
+        self.games = np.empty(0, dtype=np.int32)
+        self.players = np.empty(0, dtype=np.int64)
+
+        self.game_ids: list[str] = []
+        self.player_names: dict[int, str] = {}
+        self._game_index: dict[str, int] = {}
+        self._last_id = 0
+
+    def refresh(self, db: Database) -> int:
+        """Load new score rows from the database. Returns the number of rows added."""
+        rows = db.get_score_rows_since(self._last_id, include_archived=self._last_id == 0)
+        self.player_names = db.get_player_names()
+        if not rows:
+            return 0
+
+        ids, game_ids, player_ids, round_numbers, scores = zip(*rows, strict=True)
+        for game_id in game_ids:
+            if game_id not in self._game_index:
+                self._game_index[game_id] = len(self.game_ids)
+                self.game_ids.append(game_id)
+
+        self.scores = np.concatenate([self.scores, np.asarray(scores, dtype=np.int32)])
+        self.rounds = np.concatenate([self.rounds, np.asarray(round_numbers, dtype=np.int8)])
+        self.games = np.concatenate(
+            [self.games, np.fromiter((self._game_index[game_id] for game_id in game_ids), dtype=np.int32)]
+        )
+        self.players = np.concatenate([self.players, np.asarray(player_ids, dtype=np.int64)])
+        self._last_id = max(ids)
+        return len(rows)
+
+    def histogram(self, player_id: int | None = None, bins: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Counts of round scores in `bins` equal-width bins between 0 and 5000, and the bin edges."""
+        return np.histogram(self._player_scores(player_id), bins=bins, range=(0, MAX_ROUND_SCORE))
+
+    def percentiles(self, player_id: int | None = None) -> np.ndarray:
+        """Round score percentiles (see PERCENTILES) for a player, or for everyone."""
+        scores = self._player_scores(player_id)
+        if scores.size == 0:
+            return np.zeros(len(PERCENTILES))
+        return np.percentile(scores, PERCENTILES)
+
+    def player_percentile(self, player_id: int) -> float:
+        """Share of players, in percent, whose average round score is below the player's."""
+        player_ids, averages = self._player_averages()
+        own = averages[player_ids == player_id]
+        if own.size == 0 or player_ids.size < 2:
+            return 0.0
+        return float(np.count_nonzero(averages < own[0]) / (player_ids.size - 1) * 100)
+
+    def consistency(self, player_id: int) -> tuple[float, float]:
+        """Mean and standard deviation of the player's game totals."""
+        mask = self.players == player_id
+        if not mask.any():
+            return (0.0, 0.0)
+        totals = np.bincount(self.games[mask], weights=self.scores[mask])
+        played = np.bincount(self.games[mask]) > 0
+        totals = totals[played]
+        return (float(totals.mean()), float(totals.std()))
+
+    def hardest_rounds(self, limit: int = 10, min_players: int = 2) -> list[tuple[str, int, float, int]]:
+        """The rounds with the lowest average score as (game_id, round, average, players)."""
+        if self.scores.size == 0:
+            return []
+
+        rounds_per_game = int(self.rounds.max())
+        keys = self.games.astype(np.int64) * rounds_per_game + (self.rounds.astype(np.int64) - 1)
+        counts = np.bincount(keys)
+        sums = np.bincount(keys, weights=self.scores)
+        eligible = np.flatnonzero(counts >= min_players)
+        averages = sums[eligible] / counts[eligible]
+
+        hardest = eligible[np.argsort(averages, kind="stable")[:limit]]
+        return [
+            (
+                self.game_ids[key // rounds_per_game],
+                int(key % rounds_per_game) + 1,
+                float(sums[key] / counts[key]),
+                int(counts[key]),
+            )
+            for key in hardest
+        ]
+
+    def _player_scores(self, player_id: int | None) -> np.ndarray:
+        if player_id is None:
+            return self.scores
+        return self.scores[self.players == player_id]
+
+    def _player_averages(self) -> tuple[np.ndarray, np.ndarray]:
+        player_ids, inverse = np.unique(self.players, return_inverse=True)
+        averages = np.bincount(inverse, weights=self.scores) / np.bincount(inverse)
+        return (player_ids, averages)
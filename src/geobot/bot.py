@@ -1,21 +1,41 @@
+import asyncio
 import os
-from datetime import datetime, time
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 import discord
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 
-from .db import Database
+from .admission import AdmissionControl
+from .analytics import PERCENTILES, ScoreAnalytics
+from .delivery import Outbox
 from .game import (
-    create_game,
+    challenge_link,
+    close_sessions,
+    create_games,
     fetch_game_scores,
+    replay_responses,
+    update_scores_between,
     update_todays_scores,
     update_work_week_scores,
 )
+from .guilds import DEFAULT_SCHEDULE, GuildContext, due_jobs, guild_data_dir, open_guild_database, parse_time
+from .tracks import DEFAULT_TRACK, TRACKS, get_tracks
+from .watchdog import LoopWatchdog
+
+LEADER_LEASE = "scheduler"
+LEASE_TTL_SECONDS = 60.0
+LEASE_RENEW_SECONDS = 20.0
+SCHEDULER_TICK_SECONDS = 30.0
+LIVE_POLL_TICK_SECONDS = 30.0
 
 PERIODS = ["today", "week", "weekly", "all"]
 SORTS = ["avg", "average"]
+RATING_SORTS = ["rating", "elo"]
 WEEK_PERIODS = {"week", "weekly"}
 
 load_dotenv()
@@ -25,7 +45,25 @@ intents.message_content = True
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
-db = Database()
+# Guild registry and scheduler lease. A DISCORD_CHANNEL_ID setup also keeps its scores here.
+db = open_guild_database("")
+
+# Identifies this process when competing for the scheduler lease
+instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# When this process last renewed the lease, which it holds until LEASE_TTL_SECONDS after that
+lease_renewed_at: float | None = None
+
+# Registered guilds by guild id
+guilds: dict[int, GuildContext] = {}
+
+admission = AdmissionControl()
+
+# Queued, rate-aware delivery of everything the bot posts or edits in guild channels
+outbox = Outbox(bot)
+
+# Optional event loop watchdog, enabled by setting a blocking threshold in seconds
+watchdog_threshold = os.getenv("LOOP_WATCHDOG_THRESHOLD")
+watchdog = LoopWatchdog(threshold=float(watchdog_threshold)) if watchdog_threshold else None
 
 
 def _fmt_int(value: int) -> str:
@@ -72,6 +110,28 @@ def _build_table_lines(scores: list[tuple], is_daily: bool) -> list[str]:
             )
         headers = ["#", "Player", "Score", "G", "Avg", "5k", "0s"]
 
+    return _format_table(headers, rows)
+
+
+def _build_rating_table_lines(ratings: list[tuple]) -> list[str]:
+    rows = []
+    for index, row in enumerate(ratings, start=1):
+        rows.append(
+            [
+                str(index),
+                _truncate(_sanitize_cell(str(row[0])), 16),
+                str(round(row[1])),
+                str(row[2]),
+                str(row[3]),
+                str(row[4]),
+                _fmt_int(int(row[5])),
+            ]
+        )
+    headers = ["#", "Player", "Rating", "G", "Streak", "Best", "PB"]
+    return _format_table(headers, rows)
+
+
+def _format_table(headers: list[str], rows: list[list[str]]) -> list[str]:
     all_rows = [headers] + rows
     col_widths = [max(len(str(cell)) for cell in col) for col in zip(*all_rows, strict=False)]
 
@@ -90,9 +150,17 @@ def _build_table_lines(scores: list[tuple], is_daily: bool) -> list[str]:
     return [header, separator] + body
 
 
-def build_leaderboard_embed(scores: list[tuple], game_id: str | None = None) -> discord.Embed:
-    is_daily = game_id is not None
+def build_leaderboard_embed(
+    scores: list[tuple],
+    is_daily: bool = False,
+    live: bool = False,
+    track: str | None = None,
+) -> discord.Embed:
     title = "Today's Leaderboard" if is_daily else "Leaderboard"
+    if track is not None:
+        title += f" ({track})"
+    if live:
+        title += " (live)"
     embed = discord.Embed(title=title, color=discord.Color.blurple())
 
     max_rows = 25
@@ -106,160 +174,587 @@ def build_leaderboard_embed(scores: list[tuple], game_id: str | None = None) ->
     return embed
 
 
-def set_time(hour: int, minute: int) -> time:
-    return time(hour=hour, minute=minute, tzinfo=ZoneInfo("Europe/Stockholm"))
+def build_ratings_embed(ratings: list[tuple]) -> discord.Embed:
+    embed = discord.Embed(title="Ratings", color=discord.Color.blurple())
 
+    max_rows = 25
+    table_lines = _build_rating_table_lines(ratings[:max_rows])
+    embed.description = "```\n" + "\n".join(table_lines) + "\n```"
+    if len(ratings) > max_rows:
+        hidden_count = len(ratings) - max_rows
+        embed.set_footer(text=f"Showing top {max_rows}. {hidden_count} more players.")
 
-@tasks.loop(time=set_time(6, 0))
-async def create_game_task() -> None:
-    link = create_game(db)
-    channel_id_str = os.getenv("DISCORD_CHANNEL_ID")
-    if channel_id_str is None:
-        print("DISCORD_CHANNEL_ID environment variable not set")
+    return embed
+
+
+# Scheduled jobs get the scheduled times they cover, oldest first. That is one time unless
+# the bot was down, in which case all missed runs of a job are caught up in one go.
+
+
+async def create_game_job(guild: GuildContext, runs: list[datetime]) -> None:
+    # A challenge for a day that has already passed is of no use
+    today = datetime.now(ZoneInfo("Europe/Stockholm")).date()
+    if runs[-1].date() != today:
         return
 
-    channel = await bot.fetch_channel(int(channel_id_str))
-    if isinstance(channel, discord.TextChannel):
-        await channel.send(link or "Couldn't generate challenge game.")
+    results = await create_games(guild.db, guild.tracks)
+    # Also announces challenges an earlier run created but failed to announce
+    games = [
+        (game_id, track)
+        for game_id, track in guild.db.get_challenges(today)
+        if not guild.db.was_posted("announce", game_id)
+    ]
+    lines: list[tuple[str, str | None]] = [(track, challenge_link(game_id)) for game_id, track in games]
+    lines += [(track.name, None) for track, link in results if link is None]
+    if not lines:
+        return
+    failed = "Couldn't generate challenge game."
+    if len(lines) == 1:
+        content = lines[0][1] or failed
+    else:
+        content = "\n".join(f"**{track}**: {link or failed}" for track, link in lines)
+
+    if await outbox.send(guild.channel_id, content=content) is not None:
+        for game_id, _ in games:
+            guild.db.mark_posted("announce", game_id)
 
 
-@tasks.loop(time=set_time(23, 45))
-async def fetch_todays_scores_task() -> None:
-    print("Fetching today's game scores...")
-    await update_todays_scores(db)
+async def fetch_scores_job(guild: GuildContext, runs: list[datetime]) -> None:
+    first_day, last_day = runs[0].date(), runs[-1].date()
+    print(f"Fetching game scores from {first_day} to {last_day} for guild {guild.guild_id}...")
+    await update_scores_between(guild.db, first_day, last_day)
 
 
-@tasks.loop(time=set_time(23, 59))
-async def post_daily_scores_task() -> None:
+async def live_poll_job(guild: GuildContext, now: float) -> None:
+    today = datetime.now(ZoneInfo("Europe/Stockholm")).date()
+    live_board = guild.live_board
     try:
-        game_id = db.get_latest_game_id()
-        scores = db.get_scores_rows(game_id=game_id)
+        games = guild.db.get_latest_games()
+        if not games:
+            guild.next_poll_at = now + guild.poller.record(0)
+            return
+
+        # Every track's game is one highscores request
+        if not guild.poller.try_acquire(today, calls=len(games)):
+            guild.next_poll_at = now + guild.poller.max_interval
+            return
+
+        new_rows = await update_todays_scores(guild.db)
+        guild.next_poll_at = now + guild.poller.record(new_rows)
 
-        channel_id_str = os.getenv("DISCORD_CHANNEL_ID")
-        if channel_id_str is None:
-            print("DISCORD_CHANNEL_ID environment variable not set")
+        # One live board with all of today's tracks combined
+        scores = guild.db.get_scores_rows(period="today")
+        games_key = ",".join(game_id for game_id, _ in games)
+        if not scores or not live_board.update(games_key, scores):
             return
-        channel_id = int(channel_id_str)
-        channel = await bot.fetch_channel(channel_id)
 
-        # Only send to text channels
-        if isinstance(channel, discord.TextChannel) and scores:
-            await channel.send(embed=build_leaderboard_embed(scores, game_id=game_id))
+        embed = build_leaderboard_embed(scores, is_daily=True, live=True)
+        if live_board.message is not None:
+            await outbox.edit(live_board.message, embed=embed)
+        else:
+            live_board.message = await outbox.send(guild.channel_id, embed=embed)
 
     except Exception as e:
-        print(f"Failed to post scores: {e}")
+        live_board.invalidate()
+        if isinstance(e, discord.NotFound):
+            # The live message was deleted, post a new one next time
+            live_board.message = None
+        print(f"Failed to update live leaderboard for guild {guild.guild_id}: {e}")
 
 
-@tasks.loop(time=set_time(20, 0))
-async def post_week_leaderboard() -> None:
-    now = datetime.now(ZoneInfo("Europe/Stockholm"))
-    if now.weekday() != 4:  # Only post on Fridays
-        return
+async def post_daily_scores_job(guild: GuildContext, runs: list[datetime]) -> None:
     try:
-        channel_id_str = os.getenv("DISCORD_CHANNEL_ID")
-        if channel_id_str is None:
-            print("DISCORD_CHANNEL_ID environment variable not set")
+        # Rate every day that was missed, in order, but only post the latest day's boards
+        day = runs[-1].date()
+        for game_id, _ in guild.db.get_games_between(runs[0].date(), day):
+            guild.db.rate_game(game_id)
+        # A run repeated after a restart must not post the same day twice
+        if guild.db.was_posted("daily", day.isoformat()):
             return
-        channel_id = int(channel_id_str)
-        channel = await bot.fetch_channel(channel_id)
 
-        # Only send to text channels
-        if not isinstance(channel, discord.TextChannel):
+        games = guild.db.get_games_between(day, day)
+        embeds = []
+        if len(games) > 1:
+            for game_id, track in games:
+                track_scores = guild.db.get_scores_rows(game_id=game_id)
+                if track_scores:
+                    embeds.append(build_leaderboard_embed(track_scores, is_daily=True, track=track))
+        scores = guild.db.get_scores_rows(day=day)
+        if scores:
+            embeds.append(build_leaderboard_embed(scores, is_daily=True))
+
+        if embeds and await outbox.send(guild.channel_id, embeds=embeds) is not None:
+            guild.db.mark_posted("daily", day.isoformat())
+
+    except Exception as e:
+        print(f"Failed to post scores for guild {guild.guild_id}: {e}")
+
+
+async def post_week_leaderboard_job(guild: GuildContext, runs: list[datetime]) -> None:
+    now = datetime.now(ZoneInfo("Europe/Stockholm"))
+    # Only post on Fridays, or later the same week if Friday's post was missed
+    fridays = [run for run in runs if run.weekday() == 4]
+    if not fridays or fridays[-1].isocalendar()[:2] != now.isocalendar()[:2]:
+        return
+    year, week, _ = now.isocalendar()
+    week_key = f"{year}-W{week:02d}"
+    try:
+        if guild.db.was_posted("weekly", week_key) or await outbox.resolve_channel(guild.channel_id) is None:
             return
 
         # Update scores before posting leaderboard
-        await update_work_week_scores(db)
-        scores = db.get_scores_rows(period="week", sort_by_avg=False)
+        await update_work_week_scores(guild.db)
+        scores = guild.db.get_scores_rows(period="week", sort_by_avg=False)
         if scores:
-            await channel.send(embed=build_leaderboard_embed(scores))
+            message = await outbox.send(guild.channel_id, embed=build_leaderboard_embed(scores))
         else:
-            await channel.send("No scores available for this week.")
+            message = await outbox.send(guild.channel_id, content="No scores available for this week.")
+        if message is not None:
+            guild.db.mark_posted("weekly", week_key)
+
+    except Exception as e:
+        print(f"Failed to post weekly leaderboard for guild {guild.guild_id}: {e}")
+
+
+async def maintenance_job(guild: GuildContext, runs: list[datetime]) -> None:
+    try:
+        # Archiving a season, VACUUM and the integrity check can take long, keep them off the event loop
+        await asyncio.to_thread(guild.db.roll_season_if_due)
+        await asyncio.to_thread(guild.db.run_maintenance)
+    except Exception as e:
+        print(f"Database maintenance failed for guild {guild.guild_id}: {e}")
+
+
+JOBS = {
+    "create": create_game_job,
+    "fetch": fetch_scores_job,
+    "post": post_daily_scores_job,
+    "weekly": post_week_leaderboard_job,
+    "maintenance": maintenance_job,
+}
+
+
+async def run_due_jobs(guild: GuildContext, now: datetime) -> None:
+    """Run the guild's jobs whose scheduled time has passed since they last ran, one after another."""
+    last_runs = {job: datetime.fromisoformat(last_run) for job, last_run in db.get_job_runs(guild.guild_id).items()}
+    for job in guild.schedule:
+        if job not in last_runs:
+            # Start tracking from now, a new guild has nothing to catch up
+            db.record_job_run(guild.guild_id, job, now.isoformat())
+
+    for job, runs in due_jobs(guild.schedule, last_runs, now).items():
+        if runs[0] < now - timedelta(seconds=2 * SCHEDULER_TICK_SECONDS):
+            print(f"Catching up {len(runs)} missed {job} runs for guild {guild.guild_id}")
+        try:
+            await JOBS[job](guild, runs)
+        except Exception as e:
+            print(f"Scheduled {job} job failed for guild {guild.guild_id}: {e}")
+        # Recorded even when the job failed, it is retried at its next scheduled time rather than every tick.
+        # A job cut short by a restart is not recorded and runs again. Creating and rating skip what is already
+        # done, and the posts check the posts table, so a repeated run doesn't post the same board twice.
+        db.record_job_run(guild.guild_id, job, now.isoformat())
+
+
+@tasks.loop(seconds=SCHEDULER_TICK_SECONDS)
+async def scheduler_task() -> None:
+    """Runs every guild's due jobs. The first tick after a restart catches up the runs missed while down."""
+    now = datetime.now(ZoneInfo("Europe/Stockholm"))
+    results = await asyncio.gather(
+        *(run_due_jobs(guild, now) for guild in list(guilds.values())), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Failed to run scheduled jobs: {result}")
 
+
+@tasks.loop(seconds=LIVE_POLL_TICK_SECONDS)
+async def live_poll_task() -> None:
+    """Polls the live challenges of the guilds whose adaptive poll interval has elapsed."""
+    now = asyncio.get_running_loop().time()
+    due = [guild for guild in list(guilds.values()) if now >= guild.next_poll_at]
+    await asyncio.gather(*(live_poll_job(guild, now) for guild in due))
+
+
+# Only the process holding the scheduler lease runs these
+SCHEDULED_TASKS = [
+    scheduler_task,
+    live_poll_task,
+]
+
+
+@tasks.loop(seconds=LEASE_RENEW_SECONDS)
+async def leadership_task() -> None:
+    """Runs in every process. Reloads the guild registry and starts or stops the scheduled tasks with the lease."""
+    # Guilds may have been set up or reconfigured through another process
+    try:
+        load_guilds()
+    except Exception as e:
+        print(f"Failed to reload guilds: {e}")
+
+    global lease_renewed_at
+    now = time.time()
+    try:
+        is_leader = db.acquire_lease(LEADER_LEASE, instance_id, LEASE_TTL_SECONDS, now=now)
+        lease_renewed_at = now if is_leader else None
     except Exception as e:
-        print(f"Failed to post weekly leaderboard: {e}")
+        # E.g. the database is locked by a VACUUM. The lease taken at the last renewal is still ours until it expires.
+        print(f"Failed to renew scheduler lease: {e}")
+        is_leader = lease_renewed_at is not None and now < lease_renewed_at + LEASE_TTL_SECONDS
+
+    for task in SCHEDULED_TASKS:
+        if is_leader and not task.is_running():
+            print(f"{instance_id} is the scheduler leader, starting {task.coro.__name__}")
+            task.start()
+        elif not is_leader and task.is_running() and not task.is_being_cancelled():
+            print(f"{instance_id} lost the scheduler lease, stopping {task.coro.__name__}")
+            task.cancel()
+
+
+def load_guilds() -> None:
+    """(Re)load the registered guilds, keeping the runtime state of guilds that are already loaded."""
+    for guild_id, channel_id, data_dir, schedule, tracks in db.get_guilds():
+        guild = guilds.get(guild_id)
+        if guild is None:
+            guild_db = db if not data_dir else open_guild_database(data_dir)
+            guilds[guild_id] = GuildContext(guild_id, channel_id, guild_db, schedule, tracks)
+        else:
+            guild.channel_id = channel_id
+            guild.schedule = {**DEFAULT_SCHEDULE, **schedule}
+            guild.tracks = tracks
+
+
+async def _register_legacy_guild() -> None:
+    # A DISCORD_CHANNEL_ID setup keeps its data in the working directory
+    channel_id_str = os.getenv("DISCORD_CHANNEL_ID")
+    if channel_id_str is None:
+        return
+
+    channel = await outbox.resolve_channel(int(channel_id_str))
+    if channel is not None and channel.guild.id not in guilds:
+        db.upsert_guild(channel.guild.id, channel.id, data_dir="")
 
 
 @bot.event
 async def on_ready() -> None:
     print(f"We have logged in as {bot.user}")
 
-    if os.getenv("DISCORD_CHANNEL_ID"):
-        for task in [
-            create_game_task,
-            fetch_todays_scores_task,
-            post_daily_scores_task,
-            post_week_leaderboard,
-        ]:
-            if not task.is_running():
-                task.start()
+    if watchdog is not None and not watchdog.is_running():
+        watchdog.start(asyncio.get_running_loop())
+
+    load_guilds()
+    try:
+        await _register_legacy_guild()
+        load_guilds()
+    except Exception as e:
+        print(f"Failed to register DISCORD_CHANNEL_ID guild: {e}")
+    print(f"Serving {len(guilds)} guilds")
+
+    if not leadership_task.is_running():
+        leadership_task.start()
+
+
+async def _get_guild(ctx: commands.Context) -> GuildContext | None:
+    if ctx.guild is None:
+        guild = None
+    else:
+        guild = guilds.get(ctx.guild.id)
+        if guild is None:
+            # It may have been set up through another process since the last reload
+            load_guilds()
+            guild = guilds.get(ctx.guild.id)
+    if guild is None:
+        await ctx.send("This server isn't set up yet. An admin can run `!setup` in the channel the bot should post in.")
+    return guild
+
+
+@bot.command()
+@commands.guild_only()
+@commands.has_permissions(manage_guild=True)
+async def setup(ctx: commands.Context):
+    assert ctx.guild is not None
+    existing = guilds.get(ctx.guild.id)
+    data_dir = guild_data_dir(ctx.guild.id)
+    db.upsert_guild(ctx.guild.id, ctx.channel.id, data_dir)
+    load_guilds()
+    if existing is None:
+        await ctx.send("Set up! Daily challenges and leaderboards will be posted in this channel.")
+    else:
+        await ctx.send("Daily challenges and leaderboards will now be posted in this channel.")
+
+
+@bot.command()
+@commands.guild_only()
+@commands.has_permissions(manage_guild=True)
+async def config(ctx: commands.Context, setting: str | None = None, value: str | None = None):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+
+    if setting is None or value is None:
+        schedule = ", ".join(f"{job} {at}" for job, at in guild.schedule.items())
+        tracks = guild.tracks or ", ".join(track.name for track in get_tracks())
+        await ctx.send(
+            f"Schedule (Swedish time): {schedule}\nTracks: {tracks}\n"
+            f"Change with `!config <{'|'.join(DEFAULT_SCHEDULE)}> HH:MM` or `!config tracks world,signs`."
+        )
+        return
+
+    setting = setting.lower()
+    if setting == "tracks":
+        names = [name.strip().lower() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in TRACKS]
+        if not names or unknown:
+            await ctx.send(f"Unknown tracks `{', '.join(unknown)}`. Valid tracks: {', '.join(TRACKS)}")
+            return
+        db.set_guild_tracks(guild.guild_id, ",".join(names))
+    elif setting in DEFAULT_SCHEDULE:
+        try:
+            parse_time(value)
+        except ValueError:
+            await ctx.send("Times must be given as HH:MM, e.g. `06:00`.")
+            return
+        overrides = {job: at for job, at in guild.schedule.items() if DEFAULT_SCHEDULE[job] != at}
+        overrides[setting] = value
+        db.set_guild_schedule(guild.guild_id, overrides)
+    else:
+        await ctx.send(f"Unknown setting `{setting}`. Valid settings: tracks, {', '.join(DEFAULT_SCHEDULE)}")
+        return
+
+    load_guilds()
+    await ctx.send(f"Updated {setting} to `{value}`.")
 
 
 @bot.command()
 async def leaderboard(ctx: commands.Context, *args):
     period = None
     sort_by_avg = False
+    sort_by_rating = False
+    track = None
     invalid_args = []
 
     for arg in args:
         lower = arg.lower()
         if lower in PERIODS:
             period = lower
+        elif lower in TRACKS:
+            track = lower
         elif lower in SORTS:
             sort_by_avg = True
+        elif lower in RATING_SORTS:
+            sort_by_rating = True
         else:
             invalid_args.append(lower)
 
     if invalid_args:
-        valid_options = f"Valid options: {', '.join(PERIODS + SORTS)}"
+        valid_options = f"Valid options: {', '.join(PERIODS + SORTS + RATING_SORTS + list(TRACKS))}"
         await ctx.send(f"Invalid arguments: `{', '.join(invalid_args)}`\n{valid_options}")
         return
 
-    message = await ctx.send("Fetching leaderboard, please wait... 🕐")
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+
+    if sort_by_rating:
+        # Ratings only change when a finished game is rated, so no refresh is needed
+        ratings = guild.db.get_ratings_rows()
+        if ratings:
+            await ctx.send(embed=build_ratings_embed(ratings))
+        else:
+            await ctx.send("No ratings yet.")
+        return
+
+    cache_key = (period, sort_by_avg, track)
+    if not admission.try_admit("leaderboard", ctx.author.id, ctx.channel.id):
+        cached = guild.leaderboard_cache.get(cache_key)
+        if cached is not None:
+            await ctx.send("Busy right now, here is the last fetched leaderboard.", embed=cached)
+        else:
+            await ctx.send("Busy right now, please try again in a moment.")
+        return
 
     try:
-        game_id = None
-        if period == "today":
-            game_id = db.get_latest_game_id()
+        message = await ctx.send("Fetching leaderboard, please wait... 🕐")
+    except Exception:
+        # Give the slot back, otherwise it stays taken until the process restarts
+        admission.release()
+        raise
 
+    try:
         if period in WEEK_PERIODS:
-            await update_work_week_scores(db)
+            await update_work_week_scores(guild.db)
         else:
-            await update_todays_scores(db)
+            await update_todays_scores(guild.db)
 
-        scores = db.get_scores_rows(
-            game_id=game_id,
+        scores = guild.db.get_scores_rows(
             period=period,
             sort_by_avg=sort_by_avg,
+            track=track,
         )
 
         if scores:
-            await message.edit(
-                content=None,
-                embed=build_leaderboard_embed(scores, game_id=game_id),
-            )
+            embed = build_leaderboard_embed(scores, is_daily=period == "today", track=track)
+            guild.leaderboard_cache[cache_key] = embed
+            await outbox.edit(message, content=None, embed=embed)
         else:
-            await message.edit(content="No scores found.")
+            await outbox.edit(message, content="No scores found.")
     except Exception as e:
         print(f"Failed to fetch leaderboard: {e}")
         try:
-            await message.edit(content=f"Failed to fetch leaderboard: {e}")
+            await outbox.edit(message, content=f"Failed to fetch leaderboard: {e}")
         except Exception as edit_error:
             print(f"Failed to edit leaderboard status message: {edit_error}")
+    finally:
+        admission.release()
 
 
 @bot.command()
-async def add_game(ctx: commands.Context, game_id: str):
-    db.add_game(game_id)
-    await fetch_game_scores(db, game_id)
+async def add_game(ctx: commands.Context, game_id: str, track: str = DEFAULT_TRACK):
+    if track not in TRACKS:
+        await ctx.send(f"Unknown track `{track}`. Valid tracks: {', '.join(TRACKS)}")
+        return
+
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+
+    if not admission.try_admit("add_game", ctx.author.id, ctx.channel.id):
+        await ctx.send("Busy right now, please try again in a moment.")
+        return
+
+    try:
+        guild.db.add_game(game_id, track=track)
+        await fetch_game_scores(guild.db, game_id)
+    finally:
+        admission.release()
     await ctx.send("Game added to the database.")
 
 
+@bot.command()
+@commands.is_owner()
+async def rebuild_ratings(ctx: commands.Context):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+    games_rated = await asyncio.to_thread(guild.db.rebuild_ratings)
+    await ctx.send(f"Ratings rebuilt from {games_rated} games.")
+
+
+@bot.command()
+@commands.is_owner()
+async def replay(ctx: commands.Context):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+    games_replayed, games_failed = await asyncio.to_thread(replay_responses, guild.db)
+    # Replayed scores get new row ids, so the analytics arrays have to be loaded from scratch
+    guild.analytics = ScoreAnalytics()
+    guild.leaderboard_cache.clear()
+    await ctx.send(
+        f"Replayed {games_replayed} games from archived API responses"
+        + (f", skipped {games_failed} that failed to parse. " if games_failed else ". ")
+        + "Run `!rebuild_ratings` to apply any changed scores to the ratings."
+    )
+
+
+def _build_histogram_lines(counts: list[int], edges: list[float]) -> list[str]:
+    max_count = max(max(counts), 1)
+    lines = []
+    for index, (count, low, high) in enumerate(zip(counts, edges, edges[1:], strict=False)):
+        # The last bin includes its upper edge, e.g. perfect 5000 rounds
+        upper = int(high) if index == len(counts) - 1 else int(high) - 1
+        bar = "█" * round(count / max_count * 20)
+        lines.append(f"{int(low):>4}-{upper:<4} {bar} {count}")
+    return lines
+
+
+@bot.command()
+async def distribution(ctx: commands.Context, *, player: str | None = None):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+    analytics = guild.analytics
+    analytics.refresh(guild.db)
+
+    player_id = None
+    if player is not None:
+        matches = [pid for pid, name in analytics.player_names.items() if name.lower() == player.lower()]
+        if not matches:
+            await ctx.send(f"No player named `{player}`.")
+            return
+        player_id = matches[0]
+
+    counts, edges = analytics.histogram(player_id)
+    if counts.sum() == 0:
+        await ctx.send("No scores found.")
+        return
+
+    title = f"Round scores of {player}" if player is not None else "Round scores"
+    lines = _build_histogram_lines(counts.tolist(), edges.tolist())
+    lines.append("")
+    lines.append(
+        "  ".join(
+            f"p{p}: {_fmt_int(int(v))}" for p, v in zip(PERCENTILES, analytics.percentiles(player_id), strict=True)
+        )
+    )
+    if player_id is not None:
+        mean, std = analytics.consistency(player_id)
+        lines.append(f"Game avg: {_fmt_int(round(mean))} ± {_fmt_int(round(std))}")
+        lines.append(f"Better than {analytics.player_percentile(player_id):.0f}% of players")
+
+    embed = discord.Embed(title=title, color=discord.Color.blurple())
+    embed.description = "```\n" + "\n".join(lines) + "\n```"
+    await ctx.send(embed=embed)
+
+
+@bot.command()
+async def hardest(ctx: commands.Context, limit: int = 10):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+    guild.analytics.refresh(guild.db)
+    rounds = guild.analytics.hardest_rounds(limit=min(max(limit, 1), 25))
+    if not rounds:
+        await ctx.send("No scores found.")
+        return
+
+    rows = [
+        [str(index), game_id, str(round_number), _fmt_int(round(average)), str(players)]
+        for index, (game_id, round_number, average, players) in enumerate(rounds, start=1)
+    ]
+    embed = discord.Embed(title="Hardest Rounds", color=discord.Color.blurple())
+    table_lines = _format_table(["#", "Game", "Round", "Avg", "Players"], rows)
+    embed.description = "```\n" + "\n".join(table_lines) + "\n```"
+    await ctx.send(embed=embed)
+
+
+@bot.command()
+async def dbstats(ctx: commands.Context):
+    guild = await _get_guild(ctx)
+    if guild is None:
+        return
+    stats = guild.db.get_db_stats_rows()
+    if not stats:
+        await ctx.send("No database maintenance has run yet.")
+        return
+
+    lines = [
+        f"{recorded_at}  {_fmt_int(size_bytes // 1024)} KiB ({_fmt_int(free_bytes // 1024)} KiB free)  {integrity}"
+        for recorded_at, size_bytes, free_bytes, integrity in stats
+    ]
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+
 def main() -> None:
     token = os.getenv("DISCORD_TOKEN")
     if token is None:
         print("DISCORD_TOKEN environment variable not set")
     else:
-        bot.run(token)
+        try:
+            bot.run(token)
+        finally:
+            close_sessions()
+            # Let another replica take over the scheduled tasks right away
+            db.release_lease(LEADER_LEASE, instance_id)
 
 
 if __name__ == "__main__":
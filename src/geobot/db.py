@@ -1,18 +1,46 @@
 import datetime
+import json
+import os
 import sqlite3
+import time
 from collections.abc import Iterator
 from contextlib import contextmanager
 from zoneinfo import ZoneInfo
 
+from .rating import PlayerRating, apply_game
+from .responses import ResponseStore
+from .tracks import DEFAULT_TRACK
+
+SEASON_WEEKS = 13
+
+# Games created on the same local day as the most recent game
+LATEST_DAY_CONDITION = "DATE(created_at, 'localtime') = (SELECT DATE(MAX(created_at), 'localtime') FROM games)"
+
 
 class Database:
-    def __init__(self, conn: sqlite3.Connection | None = None):
+    def __init__(
+        self,
+        conn: sqlite3.Connection | None = None,
+        path: str = "database.db",
+        archive_dir: str = "archive",
+        season_weeks: int = SEASON_WEEKS,
+        responses: ResponseStore | None = None,
+        registry: bool = False,
+    ):
         # To re-use connection for in-memory database
         self.conn = conn
+        self.path = path
+        self.archive_dir = archive_dir
+        self.season_weeks = season_weeks
+        # Raw API responses are archived here when set
+        self.responses = responses
 
         with self.db_connection() as conn:
             cursor = conn.cursor()
 
+            # Only takes effect for new databases, existing ones are converted by run_maintenance
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
             cursor.execute("""
             CREATE TABLE IF NOT EXISTS players (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,9 +53,13 @@ class Database:
             CREATE TABLE IF NOT EXISTS games (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 game_id TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                track TEXT NOT NULL DEFAULT 'world',
+                challenge_day TEXT
             )
             """)
+            self._migrate_games_track(cursor)
+            self._migrate_games_challenge_day(cursor)
 
             cursor.execute("""
             CREATE TABLE IF NOT EXISTS scores (
@@ -41,14 +73,148 @@ class Database:
                 FOREIGN KEY (player_id) REFERENCES players(id)
             )
             """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ratings (
+                player_id INTEGER PRIMARY KEY,
+                rating REAL NOT NULL,
+                games_rated INTEGER NOT NULL DEFAULT 0,
+                win_streak INTEGER NOT NULL DEFAULT 0,
+                best_streak INTEGER NOT NULL DEFAULT 0,
+                best_score INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY (player_id) REFERENCES players(id)
+            )
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS seasons (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_on DATE NOT NULL,
+                ended_on DATE,
+                archive_path TEXT
+            )
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS season_summaries (
+                season_id INTEGER,
+                player_id INTEGER,
+                track TEXT NOT NULL DEFAULT 'world',
+                total_score INTEGER NOT NULL,
+                games_played INTEGER NOT NULL,
+                perfect_scores INTEGER NOT NULL,
+                missed_scores INTEGER NOT NULL,
+                PRIMARY KEY (season_id, player_id, track),
+                FOREIGN KEY (season_id) REFERENCES seasons(id),
+                FOREIGN KEY (player_id) REFERENCES players(id)
+            )
+            """)
+            self._migrate_season_summaries_track(cursor)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS db_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                size_bytes INTEGER NOT NULL,
+                free_bytes INTEGER NOT NULL,
+                integrity TEXT NOT NULL
+            )
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rated_games (
+                game_id TEXT PRIMARY KEY,
+                rated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (game_id) REFERENCES games(game_id)
+            )
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, key)
+            )
+            """)
+
+            if registry:
+                # Guild registry, scheduler lease and job runs, shared by all guilds
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """)
+
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS guilds (
+                    guild_id INTEGER PRIMARY KEY,
+                    channel_id INTEGER NOT NULL,
+                    data_dir TEXT NOT NULL,
+                    schedule TEXT NOT NULL DEFAULT '{}',
+                    tracks TEXT
+                )
+                """)
+
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_runs (
+                    guild_id INTEGER NOT NULL,
+                    job TEXT NOT NULL,
+                    last_run TEXT NOT NULL,
+                    PRIMARY KEY (guild_id, job)
+                )
+                """)
             conn.commit()
 
+    def _column_names(self, cursor: sqlite3.Cursor, table: str) -> list[str]:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in cursor.fetchall()]
+
+    def _migrate_games_track(self, cursor: sqlite3.Cursor) -> None:
+        # Databases from before challenge tracks only have world games
+        if "track" not in self._column_names(cursor, "games"):
+            cursor.execute("ALTER TABLE games ADD COLUMN track TEXT NOT NULL DEFAULT 'world'")
+
+    def _migrate_games_challenge_day(self, cursor: sqlite3.Cursor) -> None:
+        # Games from before are not known to be scheduled challenges, so they are never re-announced
+        if "challenge_day" not in self._column_names(cursor, "games"):
+            cursor.execute("ALTER TABLE games ADD COLUMN challenge_day TEXT")
+
+    def _migrate_season_summaries_track(self, cursor: sqlite3.Cursor) -> None:
+        # The track is part of the primary key, so the table has to be rebuilt
+        if "track" in self._column_names(cursor, "season_summaries"):
+            return
+        cursor.execute("ALTER TABLE season_summaries RENAME TO season_summaries_old")
+        cursor.execute("""
+        CREATE TABLE season_summaries (
+            season_id INTEGER,
+            player_id INTEGER,
+            track TEXT NOT NULL DEFAULT 'world',
+            total_score INTEGER NOT NULL,
+            games_played INTEGER NOT NULL,
+            perfect_scores INTEGER NOT NULL,
+            missed_scores INTEGER NOT NULL,
+            PRIMARY KEY (season_id, player_id, track),
+            FOREIGN KEY (season_id) REFERENCES seasons(id),
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+        """)
+        cursor.execute("""
+            INSERT INTO season_summaries
+                (season_id, player_id, total_score, games_played, perfect_scores, missed_scores)
+            SELECT season_id, player_id, total_score, games_played, perfect_scores, missed_scores
+            FROM season_summaries_old
+        """)
+        cursor.execute("DROP TABLE season_summaries_old")
+
     @contextmanager
     def db_connection(self) -> Iterator[sqlite3.Connection]:
         if self.conn is not None:
             yield self.conn
         else:
-            conn = sqlite3.connect("database.db")
+            conn = sqlite3.connect(self.path)
             try:
                 yield conn
             finally:
@@ -70,12 +236,22 @@ class Database:
             conn.commit()
             return player_id
 
-    def add_game(self, game_id: str) -> None:
+    def add_game(
+        self,
+        game_id: str,
+        created_at: str | None = None,
+        track: str = DEFAULT_TRACK,
+        challenge_day: datetime.date | None = None,
+    ) -> None:
+        """Store a game. `challenge_day` is set for the daily challenges the bot creates, not for added games."""
         with self.db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT OR IGNORE INTO games (game_id) VALUES (?)",
-                (game_id,),
+                """
+                INSERT OR IGNORE INTO games (game_id, created_at, track, challenge_day)
+                VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?)
+                """,
+                (game_id, created_at, track, challenge_day.isoformat() if challenge_day else None),
             )
             conn.commit()
             print(f"Game {game_id} added to the database.")
@@ -90,39 +266,120 @@ class Database:
             else:
                 return None
 
-    def add_scores(self, game_id: str, scoresheet: list[tuple[str, str, int, int]]) -> None:
+    def get_latest_games(self) -> list[tuple[str, str]]:
+        """(game_id, track) of every game created on the same day as the latest game, i.e. today's games."""
         with self.db_connection() as conn:
-            player_ids = {account_id: self.upsert_player(account_id, name) for account_id, name, _, _ in scoresheet}
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT game_id, track FROM games WHERE {LATEST_DAY_CONDITION} ORDER BY id")
+            return cursor.fetchall()
 
+    def get_games_between(self, first_day: datetime.date, last_day: datetime.date) -> list[tuple[str, str]]:
+        """(game_id, track) of every game created from `first_day` through `last_day`, oldest first."""
+        with self.db_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute(
+                "SELECT game_id, track FROM games WHERE DATE(created_at, 'localtime') BETWEEN ? AND ? ORDER BY id",
+                (first_day.isoformat(), last_day.isoformat()),
+            )
+            return cursor.fetchall()
+
+    def get_challenges(self, day: datetime.date) -> list[tuple[str, str]]:
+        """(game_id, track) of the daily challenges created for `day`."""
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT game_id, track FROM games WHERE challenge_day = ? ORDER BY id",
+                (day.isoformat(),),
+            )
+            return cursor.fetchall()
+
+    def add_scores(self, game_id: str, scoresheet: list[tuple[str, str, int, int]]) -> int:
+        return self.add_scores_batch([(game_id, scoresheet)])
+
+    def add_scores_batch(
+        self,
+        scoresheets: list[tuple[str, list[tuple[str, str, int, int]]]],
+        replace_games: list[str] | None = None,
+    ) -> int:
+        """Store (game_id, scoresheet) pairs of any number of games and players in a single commit.
+
+        The existing score rows of `replace_games` are deleted in the same commit, so their stored
+        scores become exactly the given ones. Returns the number of new score rows.
+        """
+        # The latest name seen for an account wins, like with one upsert per scoresheet
+        names = {account_id: name for _, scoresheet in scoresheets for account_id, name, _, _ in scoresheet}
+        if not names and not replace_games:
+            return 0
+
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            if replace_games:
+                cursor.executemany("DELETE FROM scores WHERE game_id = ?", [(game_id,) for game_id in replace_games])
+
+            cursor.executemany(
+                """
+                INSERT INTO players (account_id, name)
+                VALUES (?, ?)
+                ON CONFLICT(account_id) DO UPDATE SET name = excluded.name
+                """,
+                list(names.items()),
+            )
+            player_ids = {}
+            for account_id in names:
+                cursor.execute("SELECT id FROM players WHERE account_id = ?", (account_id,))
+                player_ids[account_id] = cursor.fetchone()[0]
+
             cursor.executemany(
                 "INSERT OR IGNORE INTO scores (game_id, player_id, round_number, score) VALUES (?, ?, ?, ?)",
-                [(game_id, player_ids[account_id], round_num, score) for account_id, _, round_num, score in scoresheet],
+                [
+                    (game_id, player_ids[account_id], round_num, score)
+                    for game_id, scoresheet in scoresheets
+                    for account_id, _, round_num, score in scoresheet
+                ],
             )
+            new_rows = max(cursor.rowcount, 0)
             conn.commit()
-            if cursor.rowcount > 0:
-                print("Scores added to the database.")
+
+        if new_rows > 0:
+            print("Scores added to the database.")
+        return new_rows
 
     def get_scores_rows(
         self,
         game_id: str | None = None,
         period: str | None = None,
         sort_by_avg: bool = False,
+        track: str | None = None,
+        day: datetime.date | None = None,
     ) -> list[tuple]:
+        """Leaderboard rows for one game, today's games, one day's games, this work week or all time.
+
+        `track` limits the board to one challenge track, otherwise all tracks are combined.
+        """
         with self.db_connection() as conn:
             cursor = conn.cursor()
 
             if game_id:
-                query = self._get_game_scores_query()
+                query = self._get_game_scores_query("s.game_id = ?")
                 cursor.execute(query, (game_id,))
+            elif period == "today" or day is not None:
+                games_query = f"SELECT game_id FROM games WHERE {LATEST_DAY_CONDITION}"
+                params: tuple = ()
+                if day is not None:
+                    games_query = "SELECT game_id FROM games WHERE DATE(created_at, 'localtime') = ?"
+                    params = (day.isoformat(),)
+                if track is not None:
+                    games_query += " AND track = ?"
+                    params += (track,)
+                cursor.execute(self._get_game_scores_query(f"s.game_id IN ({games_query})"), params)
             else:
-                query, date = self._get_scores_query(period, sort_by_avg)
-                cursor.execute(query, date)
+                query, params = self._get_scores_query(period, sort_by_avg, track)
+                cursor.execute(query, params)
             scores = cursor.fetchall()
         return scores
 
-    def _get_game_scores_query(self) -> str:
-        return """
+    def _get_game_scores_query(self, condition: str) -> str:
+        return f"""
             SELECT
                 p.name,
                 SUM(s.score) as total_score,
@@ -130,13 +387,22 @@ class Database:
                 COUNT(CASE WHEN s.score = 0 THEN 1 END) as missed_scores
             FROM scores s
             JOIN players p ON s.player_id = p.id
-            WHERE s.game_id = ?
+            WHERE {condition}
             GROUP BY p.id, p.name
             ORDER BY total_score DESC
         """
 
-    def _get_scores_query(self, period: str | None, sort_by_avg: bool) -> tuple[str, tuple]:
-        query = """
+    def _get_scores_query(self, period: str | None, sort_by_avg: bool, track: str | None = None) -> tuple[str, tuple]:
+        order_by = "average_score DESC" if sort_by_avg else "total_score DESC"
+        if period not in {"week", "weekly"}:
+            return self._get_all_time_scores_query(order_by, track)
+
+        today = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
+        monday = today - datetime.timedelta(days=today.weekday())
+        friday = monday + datetime.timedelta(days=4)
+
+        track_condition = "" if track is None else "AND g.track = ?"
+        query = f"""
             SELECT
                 p.name,
                 SUM(s.score) AS total_score,
@@ -147,24 +413,479 @@ class Database:
             FROM scores s
             JOIN games g ON s.game_id = g.game_id
             JOIN players p ON s.player_id = p.id
+            WHERE DATE(g.created_at, 'localtime') BETWEEN ? AND ? {track_condition}
+            GROUP BY p.id, p.name
+            ORDER BY {order_by}
         """
+        params: tuple = (monday.isoformat(), friday.isoformat())
+        if track is not None:
+            params += (track,)
 
-        date_range: tuple = ()
-        if period in {"week", "weekly"}:
-            today = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
-            monday = today - datetime.timedelta(days=today.weekday())
-            friday = monday + datetime.timedelta(days=4)
-
-            query += "WHERE DATE(g.created_at, 'localtime') BETWEEN ? AND ?"
-            date_range = (monday.isoformat(), friday.isoformat())
+        return (query, params)
 
-        order_by = "average_score DESC" if sort_by_avg else "total_score DESC"
-        query += f"""
+    def _get_all_time_scores_query(self, order_by: str, track: str | None) -> tuple[str, tuple]:
+        # Raw rows only cover the current season, older seasons are frozen into summaries
+        games_condition = "" if track is None else "WHERE g.track = ?"
+        summaries_condition = "" if track is None else "WHERE track = ?"
+        query = f"""
+            SELECT
+                p.name,
+                SUM(t.total_score) AS total_score,
+                SUM(t.games_played) AS games_played,
+                SUM(t.total_score) / SUM(t.games_played) AS average_score,
+                SUM(t.perfect_scores) AS perfect_scores,
+                SUM(t.missed_scores) AS missed_scores
+            FROM (
+                SELECT
+                    s.player_id,
+                    SUM(s.score) AS total_score,
+                    COUNT(DISTINCT s.game_id) AS games_played,
+                    COUNT(CASE WHEN s.score = 5000 THEN 1 END) AS perfect_scores,
+                    COUNT(CASE WHEN s.score = 0 THEN 1 END) AS missed_scores
+                FROM scores s
+                JOIN games g ON s.game_id = g.game_id
+                {games_condition}
+                GROUP BY s.player_id
+                UNION ALL
+                SELECT player_id, total_score, games_played, perfect_scores, missed_scores
+                FROM season_summaries
+                {summaries_condition}
+            ) t
+            JOIN players p ON t.player_id = p.id
             GROUP BY p.id, p.name
             ORDER BY {order_by}
         """
+        params = () if track is None else (track, track)
+        return (query, params)
+
+    def _current_season(self, cursor: sqlite3.Cursor) -> tuple[int, datetime.date]:
+        cursor.execute("SELECT id, started_on FROM seasons WHERE ended_on IS NULL ORDER BY id DESC LIMIT 1")
+        result = cursor.fetchone()
+        if result:
+            return (result[0], datetime.date.fromisoformat(result[1]))
+
+        # First season starts on the Monday of the week of the oldest game
+        cursor.execute("SELECT DATE(MIN(created_at), 'localtime') FROM games")
+        oldest = cursor.fetchone()[0]
+        first_day = (
+            datetime.date.fromisoformat(oldest)
+            if oldest
+            else datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
+        )
+        started_on = first_day - datetime.timedelta(days=first_day.weekday())
+        cursor.execute("INSERT INTO seasons (started_on) VALUES (?)", (started_on.isoformat(),))
+        season_id = cursor.lastrowid
+        assert season_id is not None
+        return (season_id, started_on)
+
+    def get_current_season_start(self) -> datetime.date:
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            _, started_on = self._current_season(cursor)
+            conn.commit()
+        return started_on
+
+    def roll_season_if_due(self, today: datetime.date | None = None) -> bool:
+        """Archive every season that has ended by `today`. Returns True if any season rolled over."""
+        if today is None:
+            today = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
+
+        rolled = False
+        while True:
+            started_on = self.get_current_season_start()
 
-        return (query, date_range)
+            # Seasons start and end on Mondays, so weekly boards never span two seasons
+            ends_on = started_on + datetime.timedelta(weeks=self.season_weeks)
+            if today < ends_on:
+                return rolled
+            self.archive_season(ends_on)
+            rolled = True
+
+    def archive_season(self, ends_on: datetime.date) -> int:
+        """Close the current season on `ends_on` and move its raw games and scores into an archive file.
+
+        The hot database keeps a per-player summary of the season. Returns the number of archived games.
+        """
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            season_id, _ = self._current_season(cursor)
+            conn.commit()
+
+            os.makedirs(self.archive_dir, exist_ok=True)
+            archive_path = os.path.join(self.archive_dir, f"season_{season_id}.db")
+            cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                self._create_archive_tables(cursor)
+
+                cursor.execute("DROP TABLE IF EXISTS temp.archived_games")
+                cursor.execute(
+                    "CREATE TEMP TABLE archived_games AS SELECT game_id FROM games WHERE DATE(created_at, 'localtime') < ?",
+                    (ends_on.isoformat(),),
+                )
+                cursor.execute(
+                    """
+                    INSERT INTO season_summaries
+                        (season_id, player_id, track, total_score, games_played, perfect_scores, missed_scores)
+                    SELECT
+                        ?,
+                        s.player_id,
+                        g.track,
+                        SUM(s.score),
+                        COUNT(DISTINCT s.game_id),
+                        COUNT(CASE WHEN s.score = 5000 THEN 1 END),
+                        COUNT(CASE WHEN s.score = 0 THEN 1 END)
+                    FROM scores s
+                    JOIN games g ON s.game_id = g.game_id
+                    WHERE s.game_id IN (SELECT game_id FROM archived_games)
+                    GROUP BY s.player_id, g.track
+                    """,
+                    (season_id,),
+                )
+                cursor.execute("""
+                    INSERT OR IGNORE INTO archive.players (id, account_id, name)
+                    SELECT id, account_id, name FROM players
+                    WHERE id IN (SELECT player_id FROM scores WHERE game_id IN archived_games)
+                """)
+                cursor.execute("""
+                    INSERT OR IGNORE INTO archive.games (id, game_id, created_at, track)
+                    SELECT id, game_id, created_at, track FROM games WHERE game_id IN archived_games
+                """)
+                cursor.execute("""
+                    INSERT OR IGNORE INTO archive.scores (id, game_id, player_id, round_number, score)
+                    SELECT id, game_id, player_id, round_number, score FROM scores WHERE game_id IN archived_games
+                """)
+                cursor.execute("DELETE FROM scores WHERE game_id IN archived_games")
+                cursor.execute("DELETE FROM games WHERE game_id IN archived_games")
+                archived_count = cursor.rowcount
+
+                cursor.execute(
+                    "UPDATE seasons SET ended_on = ?, archive_path = ? WHERE id = ?",
+                    (ends_on.isoformat(), archive_path, season_id),
+                )
+                cursor.execute("INSERT INTO seasons (started_on) VALUES (?)", (ends_on.isoformat(),))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS temp.archived_games")
+                cursor.execute("DETACH DATABASE archive")
+
+        print(f"Season {season_id} archived to {archive_path} ({archived_count} games).")
+        return archived_count
+
+    def _create_archive_tables(self, cursor: sqlite3.Cursor) -> None:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive.players (
+            id INTEGER PRIMARY KEY,
+            account_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive.games (
+            id INTEGER PRIMARY KEY,
+            game_id TEXT UNIQUE,
+            created_at TIMESTAMP,
+            track TEXT
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive.scores (
+            id INTEGER PRIMARY KEY,
+            game_id TEXT,
+            player_id INTEGER,
+            round_number INTEGER,
+            score INTEGER,
+            UNIQUE(game_id, player_id, round_number)
+        )
+        """)
+
+    def _query_archives(self, cursor: sqlite3.Cursor, query: str) -> list[tuple]:
+        """Run `query` against every season archive, attached as `archive`, oldest season first."""
+        cursor.execute("SELECT archive_path FROM seasons WHERE archive_path IS NOT NULL ORDER BY id")
+        archive_paths = [row[0] for row in cursor.fetchall()]
+
+        rows: list[tuple] = []
+        for archive_path in archive_paths:
+            if not os.path.exists(archive_path):
+                print(f"Season archive {archive_path} is missing, skipping it.")
+                continue
+            cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                cursor.execute(query)
+                rows.extend(cursor.fetchall())
+            finally:
+                cursor.execute("DETACH DATABASE archive")
+        return rows
+
+    def _archived_game_totals(self, cursor: sqlite3.Cursor) -> list[tuple]:
+        """Per-player totals of every archived game, oldest season and game first."""
+        return self._query_archives(
+            cursor,
+            """
+            SELECT s.game_id, s.player_id, SUM(s.score)
+            FROM archive.scores s
+            JOIN archive.games g ON s.game_id = g.game_id
+            GROUP BY g.id, s.player_id
+            ORDER BY g.id
+            """,
+        )
+
+    def get_score_rows_since(self, after_id: int = 0, include_archived: bool = False) -> list[tuple]:
+        """Raw (id, game_id, player_id, round_number, score) rows with an id above `after_id`, in id order.
+
+        Archived rows keep their original ids, so they sort before the current season's rows.
+        """
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            rows = []
+            if include_archived:
+                rows = self._query_archives(
+                    cursor,
+                    "SELECT id, game_id, player_id, round_number, score FROM archive.scores ORDER BY id",
+                )
+            cursor.execute(
+                "SELECT id, game_id, player_id, round_number, score FROM scores WHERE id > ? ORDER BY id",
+                (after_id,),
+            )
+            return rows + cursor.fetchall()
+
+    def get_player_names(self) -> dict[int, str]:
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name FROM players")
+            return dict(cursor.fetchall())
+
+    def run_maintenance(self) -> tuple[int, int, str]:
+        """Refresh planner statistics, reclaim free pages and check integrity.
+
+        Records and returns the database size in bytes, its free bytes and the integrity check result.
+        """
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("ANALYZE")
+            conn.commit()
+
+            cursor.execute("PRAGMA auto_vacuum")
+            if cursor.fetchone()[0] != 2:
+                # Incremental vacuum needs a one-off full VACUUM to switch modes
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                cursor.execute("VACUUM")
+            else:
+                cursor.execute("PRAGMA incremental_vacuum").fetchall()
+
+            cursor.execute("PRAGMA integrity_check")
+            integrity = "; ".join(row[0] for row in cursor.fetchall())
+
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_count")
+            size_bytes = cursor.fetchone()[0] * page_size
+            cursor.execute("PRAGMA freelist_count")
+            free_bytes = cursor.fetchone()[0] * page_size
+
+            cursor.execute("SELECT size_bytes FROM db_stats ORDER BY id DESC LIMIT 1")
+            previous = cursor.fetchone()
+            cursor.execute(
+                "INSERT INTO db_stats (size_bytes, free_bytes, integrity) VALUES (?, ?, ?)",
+                (size_bytes, free_bytes, integrity),
+            )
+            conn.commit()
+
+        change = f", {size_bytes - previous[0]:+d} bytes since last run" if previous else ""
+        print(f"Database maintenance done: {size_bytes} bytes ({free_bytes} free{change}), integrity {integrity}")
+        return (size_bytes, free_bytes, integrity)
+
+    def get_db_stats_rows(self, limit: int = 10) -> list[tuple]:
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT recorded_at, size_bytes, free_bytes, integrity FROM db_stats ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            return cursor.fetchall()
+
+    def rate_game(self, game_id: str) -> bool:
+        """Apply a finished game to the ratings. Only touches the players in that game.
+
+        Returns False if the game has no scores or has already been rated.
+        """
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM rated_games WHERE game_id = ?", (game_id,))
+            if cursor.fetchone():
+                return False
+
+            cursor.execute(
+                "SELECT player_id, SUM(score) FROM scores WHERE game_id = ? GROUP BY player_id",
+                (game_id,),
+            )
+            totals = dict(cursor.fetchall())
+            if not totals:
+                return False
+
+            placeholders = ", ".join("?" * len(totals))
+            cursor.execute(
+                f"""
+                SELECT player_id, rating, games_rated, win_streak, best_streak, best_score
+                FROM ratings
+                WHERE player_id IN ({placeholders})
+                """,
+                tuple(totals),
+            )
+            ratings = {row[0]: PlayerRating(*row[1:]) for row in cursor.fetchall()}
+
+            apply_game(ratings, totals)
+            self._save_ratings(cursor, ratings)
+            cursor.execute("INSERT INTO rated_games (game_id) VALUES (?)", (game_id,))
+            conn.commit()
+            return True
+
+    def rebuild_ratings(self) -> int:
+        """Recompute all ratings from scratch by replaying every game in creation order.
+
+        Returns the number of games rated.
+        """
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            archived_totals = self._archived_game_totals(cursor)
+            cursor.execute("""
+                SELECT s.game_id, s.player_id, SUM(s.score)
+                FROM scores s
+                JOIN games g ON s.game_id = g.game_id
+                GROUP BY g.id, s.player_id
+                ORDER BY g.id
+            """)
+
+            games: dict[str, dict[int, int]] = {}
+            for game_id, player_id, total in archived_totals + cursor.fetchall():
+                games.setdefault(game_id, {})[player_id] = total
+
+            ratings: dict[int, PlayerRating] = {}
+            for totals in games.values():
+                apply_game(ratings, totals)
+
+            cursor.execute("DELETE FROM ratings")
+            cursor.execute("DELETE FROM rated_games")
+            self._save_ratings(cursor, ratings)
+            cursor.executemany("INSERT INTO rated_games (game_id) VALUES (?)", [(game_id,) for game_id in games])
+            conn.commit()
+            print(f"Rebuilt ratings from {len(games)} games.")
+            return len(games)
+
+    def _save_ratings(self, cursor: sqlite3.Cursor, ratings: dict[int, PlayerRating]) -> None:
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO ratings (player_id, rating, games_rated, win_streak, best_streak, best_score)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(player_id, *player.as_row()) for player_id, player in ratings.items()],
+        )
+
+    def get_ratings_rows(self) -> list[tuple]:
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT p.name, r.rating, r.games_rated, r.win_streak, r.best_streak, r.best_score
+                FROM ratings r
+                JOIN players p ON r.player_id = p.id
+                ORDER BY r.rating DESC
+            """)
+            return cursor.fetchall()
+
+    def acquire_lease(self, name: str, holder: str, ttl: float, now: float | None = None) -> bool:
+        """Take or renew the lease `name` for `ttl` seconds.
+
+        Succeeds if the lease is free, expired or already held by `holder`. Processes sharing
+        the database use this to agree on a single leader.
+        """
+        if now is None:
+            now = time.time()
+
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO leases (name, holder, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+                """,
+                (name, holder, now + ttl, now),
+            )
+            conn.commit()
+            cursor.execute("SELECT holder FROM leases WHERE name = ?", (name,))
+            return cursor.fetchone()[0] == holder
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self.db_connection() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+            conn.commit()
+
+    def upsert_guild(self, guild_id: int, channel_id: int, data_dir: str) -> None:
+        """Register a guild, or move an existing guild to another channel keeping its data and settings."""
+        with self.db_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO guilds (guild_id, channel_id, data_dir)
+                VALUES (?, ?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET channel_id = excluded.channel_id
+                """,
+                (guild_id, channel_id, data_dir),
+            )
+            conn.commit()
+
+    def set_guild_schedule(self, guild_id: int, schedule: dict[str, str]) -> None:
+        with self.db_connection() as conn:
+            conn.execute("UPDATE guilds SET schedule = ? WHERE guild_id = ?", (json.dumps(schedule), guild_id))
+            conn.commit()
+
+    def set_guild_tracks(self, guild_id: int, tracks: str | None) -> None:
+        with self.db_connection() as conn:
+            conn.execute("UPDATE guilds SET tracks = ? WHERE guild_id = ?", (tracks, guild_id))
+            conn.commit()
+
+    def get_guilds(self) -> list[tuple[int, int, str, dict[str, str], str | None]]:
+        """(guild_id, channel_id, data_dir, schedule overrides, tracks) of every registered guild."""
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT guild_id, channel_id, data_dir, schedule, tracks FROM guilds ORDER BY guild_id")
+            return [
+                (guild_id, channel_id, data_dir, json.loads(schedule), tracks)
+                for guild_id, channel_id, data_dir, schedule, tracks in cursor.fetchall()
+            ]
+
+    def get_job_runs(self, guild_id: int) -> dict[str, str]:
+        """When each of the guild's scheduled jobs last ran, as ISO timestamps."""
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT job, last_run FROM job_runs WHERE guild_id = ?", (guild_id,))
+            return dict(cursor.fetchall())
+
+    def record_job_run(self, guild_id: int, job: str, last_run: str) -> None:
+        with self.db_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO job_runs (guild_id, job, last_run)
+                VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, job) DO UPDATE SET last_run = excluded.last_run
+                """,
+                (guild_id, job, last_run),
+            )
+            conn.commit()
+
+    def was_posted(self, kind: str, key: str) -> bool:
+        """Whether the `kind` post for `key`, e.g. the daily board of a day, has been sent."""
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM posts WHERE kind = ? AND key = ?", (kind, key))
+            return cursor.fetchone() is not None
+
+    def mark_posted(self, kind: str, key: str) -> None:
+        with self.db_connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO posts (kind, key) VALUES (?, ?)", (kind, key))
+            conn.commit()
 
     def print_table(self, table_name: str) -> None:
         with self.db_connection() as conn:
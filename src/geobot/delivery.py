@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+from collections import deque
+from typing import Any
+
+import discord
+
+# Dropped connections and timeouts, the request may or may not have reached Discord
+CONNECTION_ERRORS = (OSError, asyncio.TimeoutError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Other 4xx errors, e.g. an oversized embed, fail the same way every time
+    if isinstance(error, discord.HTTPException):
+        return error.status >= 500
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class _Delivery:
+    def __init__(self, kind: str, target: Any, kwargs: dict[str, Any]):
+        self.kind = kind
+        # The channel to send to, or the message to edit
+        self.target = target
+        self.kwargs = kwargs
+        self.future: asyncio.Future[discord.Message | None] = asyncio.get_running_loop().create_future()
+
+
+class Outbox:
+    """Delivers the bot's channel messages and edits through one queue per channel.
+
+    Channels are resolved once and cached. Discord rate limits message routes per
+    channel, so each channel's queue is drained in order by its own worker and a
+    throttled channel never holds back posts to other channels. An edit of a message
+    that already has an edit waiting in the queue is merged into it, so only the newest
+    content is sent. Server errors and dropped connections are retried with exponential
+    backoff, sends with a nonce so that Discord never creates the same message twice.
+    """
+
+    def __init__(self, client: discord.Client, retries: int = 3, backoff: float = 1.0):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+
+        self._channels: dict[int, discord.TextChannel] = {}
+        self._queues: dict[int, deque[_Delivery]] = {}
+        self._workers: dict[int, asyncio.Task[None]] = {}
+        self._pending_edits: dict[int, _Delivery] = {}
+
+    async def resolve_channel(self, channel_id: int) -> discord.TextChannel | None:
+        """The text channel with `channel_id`, from the gateway cache or a single REST lookup."""
+        channel = self._channels.get(channel_id)
+        if channel is not None:
+            return channel
+
+        resolved = self.client.get_channel(channel_id) or await self.client.fetch_channel(channel_id)
+        # Only send to text channels
+        if not isinstance(resolved, discord.TextChannel):
+            return None
+        self._channels[channel_id] = resolved
+        return resolved
+
+    async def send(self, channel_id: int, **kwargs: Any) -> discord.Message | None:
+        """Queue a message for the channel and wait until it is sent. Returns None if there is no such text channel."""
+        channel = await self.resolve_channel(channel_id)
+        if channel is None:
+            return None
+
+        # Discord creates at most one message per nonce, so retrying a send that did go through can't post it twice
+        delivery = _Delivery("send", channel, {"nonce": uuid.uuid4().hex[:25], **kwargs})
+        self._enqueue(channel_id, delivery)
+        return await asyncio.shield(delivery.future)
+
+    async def edit(self, message: discord.Message, **kwargs: Any) -> discord.Message | None:
+        """Queue an edit of the message, merged with any edit of it that is still waiting, and wait until it is made."""
+        pending = self._pending_edits.get(message.id)
+        if pending is not None:
+            pending.kwargs.update(kwargs)
+            return await asyncio.shield(pending.future)
+
+        delivery = _Delivery("edit", message, kwargs)
+        self._pending_edits[message.id] = delivery
+        self._enqueue(message.channel.id, delivery)
+        return await asyncio.shield(delivery.future)
+
+    def _enqueue(self, channel_id: int, delivery: _Delivery) -> None:
+        self._queues.setdefault(channel_id, deque()).append(delivery)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+
+    async def _drain(self, channel_id: int) -> None:
+        queue = self._queues[channel_id]
+        while queue:
+            delivery = queue.popleft()
+            if delivery.kind == "edit":
+                # Edits queued from now on can no longer be merged into this one
+                self._pending_edits.pop(delivery.target.id, None)
+
+            try:
+                result = await self._deliver(delivery)
+            except Exception as e:
+                if isinstance(e, (discord.Forbidden, discord.NotFound)) and delivery.kind == "send":
+                    # Resolve the channel again next time, it may have been deleted or had its permissions changed
+                    self._channels.pop(channel_id, None)
+                delivery.future.set_exception(e)
+            else:
+                delivery.future.set_result(result)
+
+        del self._workers[channel_id]
+
+    async def _deliver(self, delivery: _Delivery) -> discord.Message | None:
+        for attempt in range(self.retries + 1):
+            try:
+                if delivery.kind == "send":
+                    return await delivery.target.send(**delivery.kwargs)
+                return await delivery.target.edit(**delivery.kwargs)
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                print(f"Failed to {delivery.kind} message ({e}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        return None
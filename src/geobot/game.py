@@ -1,113 +1,259 @@
 import asyncio
 import datetime
+import json
 import os
+import threading
 from zoneinfo import ZoneInfo
 
 import requests
 from dotenv import load_dotenv
 
 from .db import Database
+from .ingest import ScoreIngest, Scoresheet
+from .tracks import DEFAULT_TRACK, TRACKS, Track, get_tracks, track_for_map
 
-# Map IDs
-I_SAW_THE_SIGN_2 = "5cfda2c9bc79e16dd866104d"
-A_COMMUNITY_WORLD = "62a44b22040f04bd36e8a914"
+# Highscores requests in flight at the same time, across all guilds
+MAX_CONCURRENT_FETCHES = 4
+fetch_limiter = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
 
 load_dotenv()
 
+# requests.Session is not thread-safe, so each worker thread gets its own HTTP client.
+# It is shared by every guild's requests on that thread, so connections to GeoGuessr are pooled.
+_local = threading.local()
+_sessions: list[requests.Session] = []
+_sessions_lock = threading.Lock()
+
 
 def _get_authenticated_session() -> requests.Session | None:
+    """The calling thread's HTTP client, with the GeoGuessr cookie set when it was created."""
     token = os.getenv("GEOGUESSR_NCFA")
     if token is None:
         print("NCFA token missing")
         return None
 
-    session = requests.Session()
-    session.cookies.set("_ncfa", token or "", domain="www.geoguessr.com")
+    session: requests.Session | None = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.cookies.set("_ncfa", token, domain="www.geoguessr.com")
+        _local.session = session
+        with _sessions_lock:
+            _sessions.append(session)
     return session
 
 
-def create_game(db: Database) -> str | None:
+def close_sessions() -> None:
+    """Close every thread's HTTP client, on shutdown."""
+    with _sessions_lock:
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
+
+
+def _get_highscores(game_id: str) -> requests.Response | None:
     session = _get_authenticated_session()
     if session is None:
         return None
+    return session.get(f"https://www.geoguessr.com/api/v3/results/highscores/{game_id}")
 
-    try:
-        token = os.getenv("GEOGUESSR_NCFA")
-        if token is None:
-            print("GEOGUESSR_NCFA environment variable not set")
-            return None
-        session.cookies.set("_ncfa", token, domain="www.geoguessr.com")
 
+def challenge_link(game_id: str) -> str:
+    return f"https://www.geoguessr.com/challenge/{game_id}"
+
+
+def create_game(db: Database, track: Track = TRACKS[DEFAULT_TRACK], day: datetime.date | None = None) -> str | None:
+    """Create a challenge on the track and store it as `day`'s challenge, today by default. Returns its link."""
+    if day is None:
+        day = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
+
+    session = _get_authenticated_session()
+    if session is None:
+        return None
+
+    try:
         res = session.post(
             "https://www.geoguessr.com/api/v3/challenges",
-            json={
-                "accessLevel": 1,
-                "forbidMoving": True,
-                "forbidRotating": False,
-                "forbidZooming": False,
-                "map": A_COMMUNITY_WORLD,
-                "timeLimit": 60,
-            },
+            json=track.challenge_settings(),
         )
         res.raise_for_status()
 
         game_id = res.json()["token"]
-        db.add_game(game_id)
-        return f"https://www.geoguessr.com/challenge/{game_id}"
+        if db.responses is not None:
+            db.responses.store("challenge", game_id, res.content)
+        db.add_game(game_id, track=track.name, challenge_day=day)
+        return challenge_link(game_id)
 
     except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
+        print(f"Request failed for track {track.name}: {e}")
         return None
-    finally:
-        session.close()
 
 
-async def fetch_game_scores(db: Database, game_id: str) -> None:
-    session = _get_authenticated_session()
-    if not session:
-        return None
+async def create_games(db: Database, tracks_str: str | None = None) -> list[tuple[Track, str | None]]:
+    """Create today's challenge for every enabled track at the same time. Returns (track, link) pairs.
 
-    try:
-        token = os.getenv("GEOGUESSR_NCFA")
-        if token is None:
-            print("GEOGUESSR_NCFA environment variable not set")
-            return
-        session.cookies.set("_ncfa", token, domain="www.geoguessr.com")
+    Tracks that already have today's challenge are skipped, so running this again after a restart is safe.
+    Games added by hand don't count, only the challenges created here.
+    """
+    today = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
+    existing = {track for _, track in db.get_challenges(today)}
+    tracks = [track for track in get_tracks(tracks_str) if track.name not in existing]
+    links = await asyncio.gather(*(asyncio.to_thread(create_game, db, track, today) for track in tracks))
+    return list(zip(tracks, links, strict=True))
 
-        res = session.get(f"https://www.geoguessr.com/api/v3/results/highscores/{game_id}")
-        res.raise_for_status()
 
-        for item in res.json().get("items", []):
-            player = item.get("game").get("player")
-            nick = player.get("nick")
-            account_id = player.get("id")
-            guesses = player.get("guesses")
+async def fetch_game_scores(db: Database, game_id: str, ingest: ScoreIngest | None = None) -> int:
+    """Fetch the highscores of a game and store them. Returns the number of new score rows.
 
-            if not nick or not guesses or not account_id:
-                print(f"Incomplete data for game {game_id}, skipping item.")
-                continue
+    With `ingest` the scores are queued for its writer instead, which counts the new rows when they are committed.
+    """
+    new_rows = 0
+    try:
+        # Run the request in a thread so concurrent fetches don't block the event loop
+        res = await asyncio.to_thread(_get_highscores, game_id)
+        if res is None:
+            return new_rows
+        res.raise_for_status()
 
-            round_scores = [round.get("roundScoreInPoints") for round in guesses]
-            scores = [(account_id, nick, i + 1, score) for i, score in enumerate(round_scores)]
+        # Archive even what the parser fails on or drops, so it can be recovered by a replay
+        if ingest is None and db.responses is not None:
+            db.responses.store("highscores", game_id, res.content)
+        try:
+            scoresheets = parse_highscores(game_id, res.json())
+        except Exception:
+            if ingest is not None:
+                await ingest.put(game_id, [], res.content)
+            raise
 
-            db.add_scores(game_id, scores)
+        if ingest is not None:
+            await ingest.put(game_id, scoresheets, res.content)
+            return new_rows
+        new_rows = db.add_scores_batch([(game_id, scores) for scores in scoresheets])
 
     except requests.exceptions.RequestException as e:
         print(f"Request failed for game {game_id}: {e}")
 
-    finally:
-        session.close()
+    return new_rows
+
 
+def parse_highscores(game_id: str, payload: dict) -> list[list[tuple[str, str, int, int]]]:
+    """Turn a highscores response into one scoresheet per player."""
+    scoresheets = []
+    for item in payload.get("items", []):
+        player = item.get("game").get("player")
+        nick = player.get("nick")
+        account_id = player.get("id")
+        guesses = player.get("guesses")
 
-async def update_todays_scores(db: Database) -> None:
-    """Fetch scores for the latest game (today's game)."""
-    game_id = db.get_latest_game_id()
-    if game_id is not None:
-        await fetch_game_scores(db, game_id)
+        if not nick or not guesses or not account_id:
+            print(f"Incomplete data for game {game_id}, skipping item.")
+            continue
+
+        round_scores = [round.get("roundScoreInPoints") for round in guesses]
+        scoresheets.append([(account_id, nick, i + 1, score) for i, score in enumerate(round_scores)])
+    return scoresheets
+
+
+def _highscores_track(payload: dict) -> str:
+    # The challenge response only has the token, the played map is in the highscores games
+    for item in payload.get("items", []):
+        map_id = item.get("game", {}).get("map")
+        if map_id:
+            return track_for_map(map_id)
+    return track_for_map(None)
+
+
+def replay_responses(db: Database) -> tuple[int, int]:
+    """Rebuild games and scores from archived API responses without calling the API.
+
+    Each replayed game's score rows are replaced by the ones parsed from its latest response. Games from
+    seasons that have already been archived are left out, and so are responses that still fail to parse.
+    Returns the number of games replayed and the number of unparsable responses.
+    """
+    if db.responses is None:
+        print("No response store configured, nothing to replay.")
+        return 0, 0
+
+    season_start = db.get_current_season_start()
+    challenges_created_at = {game_id: fetched_at for game_id, fetched_at, _ in db.responses.latest("challenge")}
+
+    def _in_current_season(fetched_at: str) -> bool:
+        local_date = (
+            datetime.datetime.fromisoformat(fetched_at)
+            .replace(tzinfo=datetime.UTC)
+            .astimezone(ZoneInfo("Europe/Stockholm"))
+            .date()
+        )
+        return local_date >= season_start
+
+    replayed_games = []
+    failed = 0
+    scoresheets: list[tuple[str, Scoresheet]] = []
+    for game_id, fetched_at, payload in db.responses.latest("highscores"):
+        if not _in_current_season(fetched_at):
+            continue
+
+        # The challenge response is archived when a game is created, so its fetch time is the creation time.
+        # Games added with !add_game have none, use their first highscores fetch instead.
+        created_at = challenges_created_at.get(game_id, fetched_at)
+        try:
+            highscores = json.loads(payload)
+            track = _highscores_track(highscores)
+            game_scoresheets = parse_highscores(game_id, highscores)
+        except Exception as e:
+            # Responses the parser fails on are archived too, keep their stored scores and replay the rest
+            print(f"Failed to replay game {game_id}: {e}")
+            failed += 1
+            continue
+
+        db.add_game(game_id, created_at=created_at, track=track)
+        scoresheets.extend((game_id, scores) for scores in game_scoresheets)
+        replayed_games.append(game_id)
+
+    # Replace rather than fill in, so a parser fix also corrects scores that were stored wrong
+    db.add_scores_batch(scoresheets, replace_games=replayed_games)
+    replayed = len(replayed_games)
+
+    print(f"Replayed {replayed} games from archived responses, {failed} failed to parse.")
+    return replayed, failed
+
+
+async def fetch_games_scores(db: Database, game_ids: list[str]) -> int:
+    """Fetch several games concurrently, at most MAX_CONCURRENT_FETCHES at a time. Returns the new score rows.
+
+    The fetched scores are written by a single ScoreIngest writer in group commits.
+    """
+
+    async def _fetch(game_id: str, ingest: ScoreIngest) -> int:
+        # A failed game must not end the batch, the ingest would close before the other games are queued
+        try:
+            async with fetch_limiter:
+                return await fetch_game_scores(db, game_id, ingest)
+        except Exception as e:
+            print(f"Failed to fetch scores for game {game_id}: {e}")
+            return 0
+
+    async with ScoreIngest(db) as ingest:
+        new_rows = await asyncio.gather(*(_fetch(game_id, ingest) for game_id in game_ids))
+    return sum(new_rows) + ingest.new_rows
+
+
+async def update_todays_scores(db: Database) -> int:
+    """Fetch scores for today's games on every track in one batch. Returns the new score rows."""
+    game_ids = [game_id for game_id, _ in db.get_latest_games()]
+    return await fetch_games_scores(db, game_ids)
+
+
+async def update_scores_between(db: Database, first_day: datetime.date, last_day: datetime.date) -> int:
+    """Fetch scores for every game created from `first_day` through `last_day` in one batch. Returns the new rows."""
+    game_ids = [game_id for game_id, _ in db.get_games_between(first_day, last_day)]
+    return await fetch_games_scores(db, game_ids)
 
 
 async def update_work_week_scores(db: Database, delay_seconds: float = 20.0) -> None:
-    """Fetch scores for all games created during the current work week (Monday-Friday)."""
+    """Fetch scores for all games created during the current work week (Monday-Friday).
+
+    Each day's tracks are fetched in one batch, with a pause between days.
+    """
     today = datetime.datetime.now(ZoneInfo("Europe/Stockholm")).date()
     monday = today - datetime.timedelta(days=today.weekday())
     friday = monday + datetime.timedelta(days=4)
@@ -115,16 +261,23 @@ async def update_work_week_scores(db: Database, delay_seconds: float = 20.0) ->
     with db.db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT game_id FROM games WHERE DATE(created_at, 'localtime') BETWEEN ? AND ?",
+            """
+            SELECT DATE(created_at, 'localtime'), game_id
+            FROM games
+            WHERE DATE(created_at, 'localtime') BETWEEN ? AND ?
+            ORDER BY id
+            """,
             (monday.isoformat(), friday.isoformat()),
         )
-        game_ids = [row[0] for row in cursor.fetchall()]
+        games_by_day: dict[str, list[str]] = {}
+        for day, game_id in cursor.fetchall():
+            games_by_day.setdefault(day, []).append(game_id)
 
-    print(f"Refreshing weekly scores for {len(game_ids)} games ({monday.isoformat()} to {friday.isoformat()})")
+    game_count = sum(len(game_ids) for game_ids in games_by_day.values())
+    print(f"Refreshing weekly scores for {game_count} games ({monday.isoformat()} to {friday.isoformat()})")
 
-    # Fetch scores for each game
-    for i, game_id in enumerate(game_ids):
-        await fetch_game_scores(db, game_id)
+    for i, game_ids in enumerate(games_by_day.values()):
+        await fetch_games_scores(db, game_ids)
 
-        if i < len(game_ids) - 1:
+        if i < len(games_by_day) - 1:
             await asyncio.sleep(delay_seconds)
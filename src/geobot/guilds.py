@@ -0,0 +1,110 @@
+import datetime
+import os
+
+import discord
+
+from .analytics import ScoreAnalytics
+from .db import Database
+from .live import AdaptivePoller, LiveBoard
+from .responses import ResponseStore
+
+# Local (Europe/Stockholm) time of each scheduled job, guilds can override any of them
+DEFAULT_SCHEDULE = {
+    "create": "06:00",
+    "fetch": "23:45",
+    "post": "23:59",
+    "weekly": "20:00",
+    "maintenance": "04:00",
+}
+
+# Runs missed longer ago than this are not caught up
+MAX_CATCH_UP = datetime.timedelta(days=7)
+
+
+class GuildContext:
+    """Settings and runtime state of one Discord server.
+
+    Every guild has its own database files, so one guild's queries never touch another
+    guild's rows.
+    """
+
+    def __init__(
+        self,
+        guild_id: int,
+        channel_id: int,
+        db: Database,
+        schedule: dict[str, str] | None = None,
+        tracks: str | None = None,
+    ):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.db = db
+        self.schedule = {**DEFAULT_SCHEDULE, **(schedule or {})}
+        # Comma separated track names, None for the CHALLENGE_TRACKS default
+        self.tracks = tracks
+
+        self.poller = AdaptivePoller()
+        self.live_board = LiveBoard()
+        self.next_poll_at = 0.0
+        self.analytics = ScoreAnalytics()
+        # Last rendered leaderboard per (period, sort_by_avg, track), served when the bot is busy
+        self.leaderboard_cache: dict[tuple[str | None, bool, str | None], discord.Embed] = {}
+
+
+def guild_data_dir(guild_id: int) -> str:
+    return os.path.join("guilds", str(guild_id))
+
+
+def open_guild_database(data_dir: str) -> Database:
+    """Open the database, season archives and response store kept in `data_dir`.
+
+    An empty `data_dir` is the working directory, where a single-server setup keeps its data.
+    Its database also holds the guild registry.
+    """
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+    return Database(
+        path=os.path.join(data_dir, "database.db"),
+        archive_dir=os.path.join(data_dir, "archive"),
+        responses=ResponseStore(os.path.join(data_dir, "responses.db")),
+        registry=not data_dir,
+    )
+
+
+def parse_time(value: str) -> datetime.time:
+    """Parse a HH:MM schedule time. Raises ValueError for anything else."""
+    hour, minute = value.split(":")
+    return datetime.time(hour=int(hour), minute=int(minute))
+
+
+def scheduled_runs(at: str, last_run: datetime.datetime, now: datetime.datetime) -> list[datetime.datetime]:
+    """The daily `at` times in (last_run, now], going back at most MAX_CATCH_UP."""
+    start = max(last_run, now - MAX_CATCH_UP)
+    time_of_day = parse_time(at)
+    runs = []
+    day = start.date()
+    while day <= now.date():
+        scheduled = datetime.datetime.combine(day, time_of_day, tzinfo=now.tzinfo)
+        if start < scheduled <= now:
+            runs.append(scheduled)
+        day += datetime.timedelta(days=1)
+    return runs
+
+
+def due_jobs(
+    schedule: dict[str, str], last_runs: dict[str, datetime.datetime], now: datetime.datetime
+) -> dict[str, list[datetime.datetime]]:
+    """The scheduled runs each job has missed since its last run, for the jobs that are due.
+
+    Jobs come in the order of their oldest missed run, so a catch-up fetches scores before posting them.
+    Jobs that have never run are not due.
+    """
+    due = {}
+    for job, at in schedule.items():
+        last_run = last_runs.get(job)
+        if last_run is None:
+            continue
+        runs = scheduled_runs(at, last_run, now)
+        if runs:
+            due[job] = runs
+    return dict(sorted(due.items(), key=lambda item: item[1][0]))
@@ -0,0 +1,79 @@
+import asyncio
+
+from .db import Database
+
+Scoresheet = list[tuple[str, str, int, int]]
+
+
+class ScoreIngest:
+    """Single writer that stores fetched highscores in group commits.
+
+    Fetchers hand over each game's raw response and parsed scoresheets with put(),
+    which only waits while the bounded queue is full. The writer takes whatever is
+    queued, waiting up to `max_delay` seconds for more, and stores up to `max_games`
+    games with one commit to the response store and one to the database. The commits
+    run in a worker thread, so fetching continues while the disk syncs.
+
+    Use it as an async context manager around the fetches. Leaving the context
+    flushes the queue, after which `new_rows` holds the total of new score rows.
+    """
+
+    def __init__(self, db: Database, max_games: int = 50, max_delay: float = 0.05, max_queue: int = 64):
+        self.db = db
+        self.max_games = max_games
+        self.max_delay = max_delay
+        self.new_rows = 0
+        self.commits = 0
+
+        # None tells the writer that no more games will be queued
+        self._queue: asyncio.Queue[tuple[str, bytes | None, list[Scoresheet]] | None] = asyncio.Queue(max_queue)
+        self._writer: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> "ScoreIngest":
+        self._writer = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        await self._queue.put(None)
+        if self._writer is not None:
+            await self._writer
+
+    async def put(self, game_id: str, scoresheets: list[Scoresheet], payload: bytes | None = None) -> None:
+        """Queue a game's scoresheets, and its raw highscores response for the response store."""
+        await self._queue.put((game_id, payload, scoresheets))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        closed = False
+        while not closed:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_games:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                except TimeoutError:
+                    break
+                if item is None:
+                    closed = True
+                    break
+                batch.append(item)
+
+            try:
+                self.new_rows += await asyncio.to_thread(self._write, batch)
+                self.commits += 1
+            except Exception as e:
+                # Keep draining, fetchers waiting on a full queue would otherwise hang
+                print(f"Failed to store scores of {len(batch)} games: {e}")
+
+    def _write(self, batch: list[tuple[str, bytes | None, list[Scoresheet]]]) -> int:
+        responses = [(game_id, payload) for game_id, payload, _ in batch if payload is not None]
+        if self.db.responses is not None and responses:
+            self.db.responses.store_many("highscores", responses)
+
+        return self.db.add_scores_batch(
+            [(game_id, scoresheet) for game_id, _, scoresheets in batch for scoresheet in scoresheets]
+        )
@@ -0,0 +1,77 @@
+import datetime
+
+import discord
+
+
+class AdaptivePoller:
+    """Decides how often to poll the live challenge.
+
+    Polls every `min_interval` seconds while new results keep arriving and backs off
+    exponentially up to `max_interval` while nothing changes. At most `daily_budget`
+    API calls are allowed per day, a poll of several challenge tracks costs one per track.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 60.0,
+        max_interval: float = 1800.0,
+        backoff: float = 2.0,
+        daily_budget: int = 200,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.daily_budget = daily_budget
+
+        self.interval = min_interval
+        self.calls_today = 0
+        self._day: datetime.date | None = None
+
+    def try_acquire(self, today: datetime.date, calls: int = 1) -> bool:
+        """Reserve `calls` API calls from today's budget. Returns False when they don't fit in what is left."""
+        if today != self._day:
+            self._day = today
+            self.calls_today = 0
+            self.interval = self.min_interval
+
+        if self.calls_today + calls > self.daily_budget:
+            return False
+
+        self.calls_today += calls
+        return True
+
+    def record(self, new_results: int) -> float:
+        """Update the interval from the outcome of a poll and return the next interval."""
+        if new_results > 0:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
+
+
+class LiveBoard:
+    """Tracks the posted live leaderboard message so it is only edited when the ranking changes."""
+
+    def __init__(self) -> None:
+        self.game_id: str | None = None
+        self.message: discord.Message | None = None
+        self._ranking: tuple | None = None
+
+    def update(self, game_id: str, scores: list[tuple]) -> bool:
+        """Record the latest scores. Returns True if the board needs to be re-rendered."""
+        if game_id != self.game_id:
+            # New challenge, start a new message
+            self.game_id = game_id
+            self.message = None
+            self._ranking = None
+
+        ranking = tuple(tuple(row) for row in scores)
+        if ranking == self._ranking:
+            return False
+
+        self._ranking = ranking
+        return True
+
+    def invalidate(self) -> None:
+        """Force the next update to re-render, e.g. after a failed send."""
+        self._ranking = None
@@ -0,0 +1,70 @@
+from bisect import bisect_left, bisect_right
+
+DEFAULT_RATING = 1500.0
+K_FACTOR = 32.0
+
+
+class PlayerRating:
+    """Rating, win streak and personal best of a single player."""
+
+    def __init__(
+        self,
+        rating: float = DEFAULT_RATING,
+        games_rated: int = 0,
+        win_streak: int = 0,
+        best_streak: int = 0,
+        best_score: int = 0,
+    ):
+        self.rating = rating
+        self.games_rated = games_rated
+        self.win_streak = win_streak
+        self.best_streak = best_streak
+        self.best_score = best_score
+
+    def as_row(self) -> tuple[float, int, int, int, int]:
+        return (self.rating, self.games_rated, self.win_streak, self.best_streak, self.best_score)
+
+
+def apply_game(ratings: dict[int, PlayerRating], totals: dict[int, int], k: float = K_FACTOR) -> None:
+    """Update `ratings` in place with the results of one game.
+
+    `totals` maps player id to the player's total score in the game. Missing players in
+    `ratings` start at the default rating. Each player is scored Elo-style against the
+    rest of the field: the actual result is the share of opponents beaten (ties count
+    half) and the expected result is taken against the field's average rating, so a
+    game costs O(n log n) in the number of players and never looks at older games.
+    """
+    if not totals:
+        return
+
+    for player_id in totals:
+        ratings.setdefault(player_id, PlayerRating())
+
+    n = len(totals)
+    if n > 1:
+        sorted_totals = sorted(totals.values())
+        rating_sum = sum(ratings[player_id].rating for player_id in totals)
+
+        deltas = {}
+        for player_id, total in totals.items():
+            own = ratings[player_id].rating
+            below = bisect_left(sorted_totals, total)
+            ties = bisect_right(sorted_totals, total) - below - 1
+            actual = (below + 0.5 * ties) / (n - 1)
+            field = (rating_sum - own) / (n - 1)
+            expected = 1 / (1 + 10 ** ((field - own) / 400))
+            deltas[player_id] = k * (actual - expected)
+
+        for player_id, delta in deltas.items():
+            ratings[player_id].rating += delta
+
+    winning_total = max(totals.values())
+    for player_id, total in totals.items():
+        player = ratings[player_id]
+        player.games_rated += 1
+        player.best_score = max(player.best_score, total)
+        if n > 1 and total == winning_total:
+            player.win_streak += 1
+            player.best_streak = max(player.best_streak, player.win_streak)
+        else:
+            player.win_streak = 0
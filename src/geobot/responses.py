@@ -0,0 +1,114 @@
+import hashlib
+import sqlite3
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class ResponseStore:
+    """Compressed archive of raw GeoGuessr API responses.
+
+    Payloads are zlib-compressed and stored once per content hash. Each fetch is logged
+    against its kind and key (the game id), except when the payload is identical to the
+    previous fetch of the same key, so repeated polls of an unchanged game cost nothing.
+    """
+
+    def __init__(self, path: str = "responses.db", conn: sqlite3.Connection | None = None):
+        self.path = path
+        # To re-use connection for in-memory database
+        self.conn = conn
+
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+            """)
+
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (hash) REFERENCES blobs(hash)
+            )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS responses_kind_key ON responses (kind, key, id)")
+            conn.commit()
+
+    @contextmanager
+    def db_connection(self) -> Iterator[sqlite3.Connection]:
+        if self.conn is not None:
+            yield self.conn
+        else:
+            conn = sqlite3.connect(self.path)
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    def store(self, kind: str, key: str, payload: bytes) -> str:
+        """Archive a raw response and return its content hash."""
+        return self.store_many(kind, [(key, payload)])[0]
+
+    def store_many(self, kind: str, responses: list[tuple[str, bytes]]) -> list[str]:
+        """Archive (key, payload) responses of one kind in a single commit and return their content hashes."""
+        hashes = []
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            for key, payload in responses:
+                content_hash = hashlib.sha256(payload).hexdigest()
+                cursor.execute("SELECT 1 FROM blobs WHERE hash = ?", (content_hash,))
+                if cursor.fetchone() is None:
+                    cursor.execute(
+                        "INSERT INTO blobs (hash, size, data) VALUES (?, ?, ?)",
+                        (content_hash, len(payload), zlib.compress(payload, 9)),
+                    )
+
+                cursor.execute(
+                    "SELECT hash FROM responses WHERE kind = ? AND key = ? ORDER BY id DESC LIMIT 1",
+                    (kind, key),
+                )
+                previous = cursor.fetchone()
+                if previous is None or previous[0] != content_hash:
+                    cursor.execute(
+                        "INSERT INTO responses (kind, key, hash) VALUES (?, ?, ?)",
+                        (kind, key, content_hash),
+                    )
+                hashes.append(content_hash)
+            conn.commit()
+
+        return hashes
+
+    def latest(self, kind: str) -> Iterator[tuple[str, str, bytes]]:
+        """Yield (key, first fetched at, payload) of the newest response per key, oldest key first."""
+        with self.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT r.key, MIN(r.fetched_at), b.data
+                FROM responses r
+                JOIN (
+                    SELECT key, MAX(id) AS latest_id
+                    FROM responses
+                    WHERE kind = ?
+                    GROUP BY key
+                ) l ON r.key = l.key
+                JOIN responses newest ON newest.id = l.latest_id
+                JOIN blobs b ON b.hash = newest.hash
+                WHERE r.kind = ?
+                GROUP BY r.key
+                ORDER BY MIN(r.id)
+                """,
+                (kind, kind),
+            )
+            rows = cursor.fetchall()
+
+        for key, first_fetched_at, data in rows:
+            yield (key, first_fetched_at, zlib.decompress(data))
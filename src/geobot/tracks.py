@@ -0,0 +1,65 @@
+import os
+
+# Map IDs
+I_SAW_THE_SIGN_2 = "5cfda2c9bc79e16dd866104d"
+A_COMMUNITY_WORLD = "62a44b22040f04bd36e8a914"
+
+DEFAULT_TRACK = "world"
+
+
+class Track:
+    """A daily challenge series: one map with one rule set."""
+
+    def __init__(
+        self,
+        name: str,
+        map_id: str,
+        time_limit: int = 60,
+        forbid_moving: bool = True,
+        forbid_rotating: bool = False,
+        forbid_zooming: bool = False,
+    ):
+        self.name = name
+        self.map_id = map_id
+        self.time_limit = time_limit
+        self.forbid_moving = forbid_moving
+        self.forbid_rotating = forbid_rotating
+        self.forbid_zooming = forbid_zooming
+
+    def challenge_settings(self) -> dict:
+        return {
+            "accessLevel": 1,
+            "forbidMoving": self.forbid_moving,
+            "forbidRotating": self.forbid_rotating,
+            "forbidZooming": self.forbid_zooming,
+            "map": self.map_id,
+            "timeLimit": self.time_limit,
+        }
+
+
+TRACKS = {
+    track.name: track
+    for track in [
+        Track(DEFAULT_TRACK, A_COMMUNITY_WORLD, time_limit=60, forbid_moving=True),
+        Track("signs", I_SAW_THE_SIGN_2, time_limit=120, forbid_moving=False),
+    ]
+}
+
+
+def get_tracks(names_str: str | None = None) -> list[Track]:
+    """The tracks named in `names_str` (comma separated), by default the ones in CHALLENGE_TRACKS or only world."""
+    if names_str is None:
+        names_str = os.getenv("CHALLENGE_TRACKS", DEFAULT_TRACK)
+    names = [name.strip().lower() for name in names_str.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TRACKS]
+    if unknown:
+        print(f"Unknown challenge tracks {', '.join(unknown)}, valid tracks: {', '.join(TRACKS)}")
+    return [TRACKS[name] for name in names if name in TRACKS] or [TRACKS[DEFAULT_TRACK]]
+
+
+def track_for_map(map_id: str | None) -> str:
+    """Name of the track played on `map_id`, falling back to the default track."""
+    for track in TRACKS.values():
+        if track.map_id == map_id:
+            return track.name
+    return DEFAULT_TRACK
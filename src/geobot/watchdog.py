@@ -0,0 +1,106 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+WATCHDOG_FILE = str(Path(__file__).resolve())
+PACKAGE_DIR = str(Path(WATCHDOG_FILE).parent)
+
+
+class LoopWatchdog:
+    """Reports when the asyncio event loop is blocked for longer than `threshold` seconds.
+
+    The loop bumps a heartbeat every `interval` seconds and a background thread checks
+    it. When the heartbeat is late, the thread captures the stack of the loop thread,
+    so the code that is hogging the loop is logged while it is still running. Blocks
+    are counted per call site, preferring the innermost frame inside this package.
+    """
+
+    def __init__(self, threshold: float = 0.5, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_beat = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._handle: asyncio.TimerHandle | None = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start watching `loop`. Must be called from the loop's own thread."""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._handle = loop.call_later(self.interval, self._heartbeat)
+
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        print(f"Event loop watchdog started (threshold {self.threshold}s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat(self) -> None:
+        self._last_beat = time.monotonic()
+        if self._loop is not None and not self._stop.is_set():
+            self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def _watch(self) -> None:
+        blocked_since: float | None = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat
+            if lag <= self.threshold:
+                if blocked_since is not None:
+                    print(f"Event loop unblocked after {self._last_beat - blocked_since:.2f}s")
+                    blocked_since = None
+                continue
+
+            if blocked_since == last_beat:
+                # Already reported this block
+                continue
+            blocked_since = last_beat
+
+            frame = sys._current_frames().get(self._loop_thread_id or -1)
+            if frame is None:
+                continue
+            self._report(frame, lag)
+
+    def _report(self, frame: FrameType, lag: float) -> None:
+        site = self._call_site(frame)
+        self.counts[site] += 1
+        stack = "".join(traceback.format_stack(frame))
+        print(
+            f"Event loop blocked for {lag:.2f}s at {site} (seen {self.counts[site]} times)\n"
+            f"{stack}"
+            f"Blocking call sites so far: {dict(self.counts.most_common(5))}"
+        )
+
+    @staticmethod
+    def _call_site(frame: FrameType) -> str:
+        innermost = frame
+        current: FrameType | None = frame
+        while current is not None:
+            filename = str(Path(current.f_code.co_filename).resolve())
+            if filename.startswith(PACKAGE_DIR) and filename != WATCHDOG_FILE:
+                innermost = current
+                break
+            current = current.f_back
+
+        code = innermost.f_code
+        return f"{Path(code.co_filename).name}:{innermost.f_lineno} in {code.co_name}"
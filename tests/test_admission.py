@@ -0,0 +1,51 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.admission import AdmissionControl
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.admission = AdmissionControl(user_cooldown=30, channel_cooldown=10, max_concurrent=2, clock=self.clock)
+
+    def test_user_and_channel_cooldowns(self):
+        self.assertTrue(self.admission.try_admit("leaderboard", 1, 100))
+        self.admission.release()
+
+        # Same user in another channel, and another user in the same channel
+        self.assertFalse(self.admission.try_admit("leaderboard", 1, 200))
+        self.assertFalse(self.admission.try_admit("leaderboard", 2, 100))
+        # Cooldowns are per command
+        self.assertTrue(self.admission.try_admit("add_game", 1, 100))
+        self.admission.release()
+
+        self.clock.now = 10
+        self.assertTrue(self.admission.try_admit("leaderboard", 2, 100))
+        self.admission.release()
+
+        self.clock.now = 30
+        self.assertTrue(self.admission.try_admit("leaderboard", 1, 200))
+
+    def test_global_concurrency_limit(self):
+        self.assertTrue(self.admission.try_admit("leaderboard", 1, 100))
+        self.assertTrue(self.admission.try_admit("leaderboard", 2, 200))
+        self.assertFalse(self.admission.try_admit("leaderboard", 3, 300))
+
+        self.admission.release()
+        self.assertTrue(self.admission.try_admit("leaderboard", 3, 300))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.delivery import Outbox
+
+
+class FakeTextChannel:
+    def __init__(self, channel_id: int) -> None:
+        self.id = channel_id
+        self.send = AsyncMock()
+
+
+def make_message(message_id: int, channel_id: int) -> MagicMock:
+    message = MagicMock()
+    message.id = message_id
+    message.channel.id = channel_id
+    message.edit = AsyncMock()
+    return message
+
+
+@patch("geobot.delivery.discord.TextChannel", FakeTextChannel)
+class TestOutbox(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+        self.channel = FakeTextChannel(123)
+        self.client = MagicMock()
+        self.client.get_channel.return_value = None
+        self.client.fetch_channel = AsyncMock(return_value=self.channel)
+        self.outbox = Outbox(self.client, retries=2, backoff=0)
+
+    async def asyncTearDown(self):
+        self.print_patcher.stop()
+
+    async def test_channel_is_fetched_once(self):
+        await self.outbox.send(123, content="first")
+        await self.outbox.send(123, content="second")
+
+        self.client.fetch_channel.assert_awaited_once_with(123)
+        self.assertEqual(self.channel.send.await_count, 2)
+
+    async def test_waiting_edits_of_a_message_are_merged(self):
+        message = make_message(1, 123)
+
+        results = await asyncio.gather(
+            self.outbox.edit(message, content=None, embed="first"),
+            self.outbox.edit(message, embed="second"),
+            self.outbox.edit(message, embed="third"),
+        )
+
+        message.edit.assert_awaited_once_with(content=None, embed="third")
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    async def test_failed_send_is_retried(self):
+        response = MagicMock(status=500, reason="Internal Server Error")
+        sent = MagicMock()
+        self.channel.send.side_effect = [discord.HTTPException(response, "oops"), sent]
+
+        self.assertIs(await self.outbox.send(123, content="hello"), sent)
+        self.assertEqual(self.channel.send.await_count, 2)
+        # Both attempts carry the same nonce, so Discord drops the second one if the first went through
+        first, second = (call.kwargs for call in self.channel.send.await_args_list)
+        self.assertEqual(first, second)
+        self.assertEqual(first["content"], "hello")
+
+    async def test_client_errors_are_not_retried(self):
+        response = MagicMock(status=400, reason="Bad Request")
+        self.channel.send.side_effect = discord.HTTPException(response, "Embed size exceeds maximum size")
+
+        with self.assertRaises(discord.HTTPException):
+            await self.outbox.send(123, content="hello")
+
+        self.channel.send.assert_awaited_once()
+
+    async def test_dropped_connection_edit_is_retried(self):
+        message = make_message(1, 123)
+        message.edit.side_effect = [ConnectionResetError(), message]
+
+        await self.outbox.edit(message, content="edited")
+
+        self.assertEqual(message.edit.await_count, 2)
+
+    async def test_deleted_or_forbidden_channel_is_not_retried_and_forgotten(self):
+        for error_type, status in [(discord.NotFound, 404), (discord.Forbidden, 403)]:
+            self.channel.send.reset_mock()
+            self.channel.send.side_effect = error_type(MagicMock(status=status, reason="Error"), "Error")
+
+            with self.assertRaises(error_type):
+                await self.outbox.send(123, content="hello")
+            self.channel.send.assert_awaited_once()
+
+        self.channel.send.side_effect = None
+        await self.outbox.send(123, content="hello again")
+        self.assertEqual(self.client.fetch_channel.await_count, 3)
+
+    async def test_slow_channel_does_not_hold_back_other_channels(self):
+        blocked = asyncio.Event()
+        other = FakeTextChannel(456)
+        self.client.fetch_channel.side_effect = lambda channel_id: self.channel if channel_id == 123 else other
+
+        async def slow_send(**_kwargs):
+            await blocked.wait()
+
+        self.channel.send.side_effect = slow_send
+        slow = asyncio.create_task(self.outbox.send(123, content="slow"))
+        await self.outbox.send(456, content="fast")
+
+        other.send.assert_awaited_once()
+        self.assertFalse(slow.done())
+        blocked.set()
+        await slow
+
+
+if __name__ == "__main__":
+    unittest.main()
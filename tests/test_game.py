@@ -1,14 +1,43 @@
+import json
 import sqlite3
 import sys
+import tempfile
+import threading
 import unittest
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
 from unittest.mock import AsyncMock, patch
+from zoneinfo import ZoneInfo
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
+from geobot.analytics import ScoreAnalytics
 from geobot.db import Database
-from geobot.game import update_work_week_scores
+from geobot.game import (
+    _get_authenticated_session,
+    close_sessions,
+    create_games,
+    replay_responses,
+    update_todays_scores,
+    update_work_week_scores,
+)
+from geobot.responses import ResponseStore
+
+
+def _highscores_payload(players: list[tuple[str, str, list[int]]]) -> bytes:
+    items = [
+        {
+            "game": {
+                "player": {
+                    "id": account_id,
+                    "nick": nick,
+                    "guesses": [{"roundScoreInPoints": score} for score in round_scores],
+                }
+            }
+        }
+        for account_id, nick, round_scores in players
+    ]
+    return json.dumps({"items": items}).encode()
 
 
 class TestDatabase(unittest.TestCase):
@@ -17,7 +46,7 @@ class TestDatabase(unittest.TestCase):
         self.print_patcher.start()
 
         self.conn = sqlite3.connect(":memory:")
-        self.db = Database(conn=self.conn)
+        self.db = Database(conn=self.conn, registry=True)
         self._add_game_with_scores(
             "game_id",
             [
@@ -75,6 +104,17 @@ class TestDatabase(unittest.TestCase):
             self.assertEqual(scores[0][2], 1)
             self.assertEqual(scores[0][4], 3000)
 
+    def test_add_scores_batch_counts_only_new_rows(self):
+        new_rows = self.db.add_scores_batch(
+            [
+                ("game_id", [("p1_id", "player1", 1, 3000)]),
+                ("game_id5", [("p1_id", "renamed", 1, 4000), ("p3_id", "player3", 1, 100)]),
+            ]
+        )
+
+        self.assertEqual(new_rows, 2)
+        self.assertEqual(sorted(self.db.get_player_names().values()), ["player2", "player3", "renamed"])
+
     def test_get_scores_from_game(self):
         scores = self.db.get_scores_rows("game_id", None, False)
 
@@ -160,6 +200,328 @@ class TestDatabase(unittest.TestCase):
         self.assertIn("weekday_player", names)
         self.assertNotIn("weekend_player", names)
 
+    def test_rate_game_is_incremental_and_idempotent(self):
+        self.assertTrue(self.db.rate_game("game_id"))
+        self.assertFalse(self.db.rate_game("game_id"))
+
+        ratings = {row[0]: row for row in self.db.get_ratings_rows()}
+        self.assertGreater(ratings["player1"][1], 1500)
+        self.assertLess(ratings["player2"][1], 1500)
+        self.assertEqual(ratings["player1"][2], 1)
+        self.assertEqual(ratings["player1"][3], 1)
+        self.assertEqual(ratings["player2"][3], 0)
+        self.assertEqual(ratings["player1"][5], 5001)
+
+    def test_win_streak_and_personal_best(self):
+        for game_id in ["game_id", "game_id2", "game_id3", "game_id4"]:
+            self.db.rate_game(game_id)
+
+        ratings = {row[0]: row for row in self.db.get_ratings_rows()}
+        # player2 won game_id2 and game_id3 and sat out game_id4, which player1 played alone
+        self.assertEqual(ratings["player2"][3], 2)
+        self.assertEqual(ratings["player2"][4], 2)
+        self.assertEqual(ratings["player2"][5], 7000)
+        self.assertEqual(ratings["player1"][4], 1)
+        self.assertEqual(ratings["player1"][2], 4)
+
+    def test_rebuild_ratings_matches_incremental(self):
+        for game_id in ["game_id", "game_id2", "game_id3", "game_id4"]:
+            self.db.rate_game(game_id)
+        incremental = self.db.get_ratings_rows()
+
+        self.assertEqual(self.db.rebuild_ratings(), 4)
+        rebuilt = self.db.get_ratings_rows()
+
+        self.assertEqual(len(rebuilt), len(incremental))
+        for rebuilt_row, incremental_row in zip(rebuilt, incremental, strict=True):
+            self.assertEqual(rebuilt_row[0], incremental_row[0])
+            self.assertAlmostEqual(rebuilt_row[1], incremental_row[1])
+            self.assertEqual(rebuilt_row[2:], incremental_row[2:])
+        self.assertFalse(self.db.rate_game("game_id4"))
+
+    def test_lease_has_single_holder_until_expiry(self):
+        self.assertTrue(self.db.acquire_lease("scheduler", "a", ttl=60, now=1000))
+        self.assertFalse(self.db.acquire_lease("scheduler", "b", ttl=60, now=1030))
+        self.assertTrue(self.db.acquire_lease("scheduler", "a", ttl=60, now=1050))
+
+        # a's renewal at 1050 holds until 1110
+        self.assertFalse(self.db.acquire_lease("scheduler", "b", ttl=60, now=1100))
+        self.assertTrue(self.db.acquire_lease("scheduler", "b", ttl=60, now=1111))
+        self.assertFalse(self.db.acquire_lease("scheduler", "a", ttl=60, now=1112))
+
+    def test_released_lease_can_be_taken_over(self):
+        self.db.acquire_lease("scheduler", "a", ttl=60, now=1000)
+        self.db.release_lease("scheduler", "b")
+        self.assertFalse(self.db.acquire_lease("scheduler", "b", ttl=60, now=1001))
+
+        self.db.release_lease("scheduler", "a")
+        self.assertTrue(self.db.acquire_lease("scheduler", "b", ttl=60, now=1002))
+
+    def test_guild_registry_keeps_settings_when_channel_moves(self):
+        self.db.upsert_guild(1, 100, "guilds/1")
+        self.db.set_guild_schedule(1, {"create": "07:30"})
+        self.db.set_guild_tracks(1, "world,signs")
+        self.db.upsert_guild(1, 200, "guilds/other")
+        self.db.upsert_guild(2, 300, "")
+
+        self.assertEqual(
+            self.db.get_guilds(),
+            [(1, 200, "guilds/1", {"create": "07:30"}, "world,signs"), (2, 300, "", {}, None)],
+        )
+
+    def test_guild_databases_have_no_registry_tables(self):
+        conn = sqlite3.connect(":memory:")
+        Database(conn=conn)
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        self.assertIn("scores", tables)
+        self.assertTrue(tables.isdisjoint({"guilds", "leases", "job_runs"}))
+
+    def test_job_runs_are_tracked_per_guild(self):
+        self.db.record_job_run(1, "create", "2026-03-05T06:00:15+01:00")
+        self.db.record_job_run(1, "create", "2026-03-06T06:00:15+01:00")
+        self.db.record_job_run(2, "post", "2026-03-05T23:59:15+01:00")
+
+        self.assertEqual(self.db.get_job_runs(1), {"create": "2026-03-06T06:00:15+01:00"})
+        self.assertEqual(self.db.get_job_runs(3), {})
+
+    def test_posts_are_marked_once_per_key(self):
+        self.assertFalse(self.db.was_posted("daily", "2026-03-05"))
+
+        self.db.mark_posted("daily", "2026-03-05")
+        self.db.mark_posted("daily", "2026-03-05")
+
+        self.assertTrue(self.db.was_posted("daily", "2026-03-05"))
+        self.assertFalse(self.db.was_posted("daily", "2026-03-06"))
+        self.assertFalse(self.db.was_posted("weekly", "2026-03-05"))
+
+    def test_games_and_board_of_one_day(self):
+        with self.db.db_connection() as conn:
+            conn.execute("UPDATE games SET created_at = '2026-03-02 12:00:00' WHERE game_id = 'game_id'")
+            conn.execute("UPDATE games SET created_at = '2026-03-03 12:00:00' WHERE game_id != 'game_id'")
+            conn.commit()
+
+        self.assertEqual(self.db.get_games_between(date(2026, 3, 1), date(2026, 3, 2)), [("game_id", "world")])
+        self.assertEqual(len(self.db.get_games_between(date(2026, 3, 2), date(2026, 3, 3))), 4)
+        self.assertEqual(self.db.get_scores_rows(day=date(2026, 3, 2)), self.db.get_scores_rows(game_id="game_id"))
+
+    def test_track_boards_and_todays_combined_board(self):
+        self.db.add_game("signs_game", track="signs")
+        self.db.add_scores("signs_game", [("p2_id", "player2", 1, 4000)])
+
+        signs = self.db.get_scores_rows(track="signs")
+        self.assertEqual([(row[0], row[1]) for row in signs], [("player2", 4000)])
+        world = self.db.get_scores_rows(track="world")
+        self.assertEqual(world[0][:3], ("player1", 20001, 4))
+
+        # All games were created today, so the combined daily board sums every track
+        today = self.db.get_scores_rows(period="today")
+        self.assertEqual([(row[0], row[1]) for row in today], [("player2", 22000), ("player1", 20001)])
+        today_signs = self.db.get_scores_rows(period="today", track="signs")
+        self.assertEqual([(row[0], row[1]) for row in today_signs], [("player2", 4000)])
+
+    def test_games_without_track_are_migrated_to_world(self):
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute(
+                "CREATE TABLE games (id INTEGER PRIMARY KEY AUTOINCREMENT, game_id TEXT UNIQUE, created_at TIMESTAMP)"
+            )
+            conn.execute("INSERT INTO games (game_id) VALUES ('old_game')")
+            conn.commit()
+
+            db = Database(conn=conn)
+
+            with db.db_connection() as migrated:
+                self.assertEqual(
+                    migrated.execute("SELECT game_id, track FROM games").fetchall(), [("old_game", "world")]
+                )
+        finally:
+            conn.close()
+
+
+class TestSeasons(unittest.TestCase):
+    def setUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(":memory:")
+        self.db = Database(conn=self.conn, archive_dir=self.archive_dir.name, season_weeks=1)
+
+        games = [
+            ("old_game", "2026-03-03 12:00:00", [("p1_id", "player1", 1, 5000), ("p2_id", "player2", 1, 1000)]),
+            ("new_game", "2026-03-10 12:00:00", [("p1_id", "player1", 1, 0), ("p2_id", "player2", 1, 3000)]),
+        ]
+        for game_id, created_at, scoresheet in games:
+            self.db.add_game(game_id)
+            self.db.add_scores(game_id, scoresheet)
+            with self.db.db_connection() as conn:
+                conn.execute("UPDATE games SET created_at = ? WHERE game_id = ?", (created_at, game_id))
+                conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.archive_dir.cleanup()
+        self.print_patcher.stop()
+
+    def test_rollover_moves_old_games_to_archive(self):
+        all_time = self.db.get_scores_rows()
+
+        self.assertFalse(self.db.roll_season_if_due(date(2026, 3, 8)))
+        self.assertTrue(self.db.roll_season_if_due(date(2026, 3, 11)))
+
+        with self.db.db_connection() as conn:
+            game_ids = [row[0] for row in conn.execute("SELECT game_id FROM games")]
+            archive_path = conn.execute("SELECT archive_path FROM seasons WHERE ended_on = '2026-03-09'").fetchone()[0]
+        self.assertEqual(game_ids, ["new_game"])
+
+        archive = sqlite3.connect(archive_path)
+        try:
+            archived_scores = archive.execute("SELECT game_id, score FROM scores ORDER BY id").fetchall()
+        finally:
+            archive.close()
+        self.assertEqual(archived_scores, [("old_game", 5000), ("old_game", 1000)])
+
+        # All-time boards combine the frozen season summaries with the current season
+        self.assertEqual(self.db.get_scores_rows(), all_time)
+
+    def test_rebuild_ratings_includes_archived_seasons(self):
+        self.db.rate_game("old_game")
+        self.db.rate_game("new_game")
+        ratings = self.db.get_ratings_rows()
+
+        self.db.roll_season_if_due(date(2026, 3, 11))
+
+        self.assertEqual(self.db.rebuild_ratings(), 2)
+        self.assertEqual(self.db.get_ratings_rows(), ratings)
+
+    def test_run_maintenance_records_size(self):
+        size_bytes, _, integrity = self.db.run_maintenance()
+
+        self.assertGreater(size_bytes, 0)
+        self.assertEqual(integrity, "ok")
+        self.assertEqual(self.db.get_db_stats_rows()[0][1:], (size_bytes, 0, "ok"))
+
+
+class TestResponseStore(unittest.TestCase):
+    def setUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+        self.conn = sqlite3.connect(":memory:")
+        self.responses = ResponseStore(conn=self.conn)
+        self.db_conn = sqlite3.connect(":memory:")
+        self.db = Database(conn=self.db_conn, responses=self.responses)
+
+    def tearDown(self):
+        self.conn.close()
+        self.db_conn.close()
+        self.print_patcher.stop()
+
+    def test_unchanged_responses_are_deduplicated(self):
+        first = _highscores_payload([("p1_id", "player1", [5000])])
+        second = _highscores_payload([("p1_id", "player1", [5000]), ("p2_id", "player2", [100])])
+
+        self.responses.store("highscores", "game_id", first)
+        self.responses.store("highscores", "game_id", first)
+        self.responses.store("highscores", "game_id", second)
+        self.responses.store("highscores", "game_id2", first)
+
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0], 2)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0], 3)
+        latest = {key: payload for key, _, payload in self.responses.latest("highscores")}
+        self.assertEqual(latest, {"game_id": second, "game_id2": first})
+
+    def test_replay_rebuilds_scores_without_api_calls(self):
+        self.responses.store("challenge", "game_id", b'{"token": "game_id"}')
+        self.responses.store(
+            "highscores",
+            "game_id",
+            _highscores_payload([("p1_id", "player1", [5000, 0]), ("p2_id", "", [100, 200])]),
+        )
+
+        with patch("geobot.game.requests.Session") as mock_session:
+            self.assertEqual(replay_responses(self.db), (1, 0))
+        mock_session.assert_not_called()
+
+        self.assertEqual(self.db.get_latest_game_id(), "game_id")
+        self.assertEqual(self.db.get_scores_rows(game_id="game_id"), [("player1", 5000, 1, 1)])
+
+    def test_replay_replaces_scores_stored_wrong(self):
+        self.db.add_game("game_id")
+        self.db.add_scores("game_id", [("p1_id", "player1", 1, 100), ("p1_id", "player1", 2, 100)])
+        self.responses.store("highscores", "game_id", _highscores_payload([("p1_id", "player1", [5000])]))
+
+        self.assertEqual(replay_responses(self.db), (1, 0))
+
+        self.assertEqual(self.db.get_scores_rows(game_id="game_id"), [("player1", 5000, 1, 0)])
+
+    def test_replay_skips_responses_that_fail_to_parse(self):
+        self.db.add_game("broken")
+        self.db.add_scores("broken", [("p1_id", "player1", 1, 100)])
+        self.responses.store("highscores", "broken", b"not json")
+        self.responses.store("highscores", "game_id", _highscores_payload([("p1_id", "player1", [5000])]))
+
+        self.assertEqual(replay_responses(self.db), (1, 1))
+
+        self.assertEqual(self.db.get_scores_rows(game_id="game_id"), [("player1", 5000, 1, 0)])
+        self.assertEqual(self.db.get_scores_rows(game_id="broken"), [("player1", 100, 0, 0)])
+
+
+class TestScoreAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+        self.conn = sqlite3.connect(":memory:")
+        self.db = Database(conn=self.conn)
+        self.db.add_game("game_id")
+        self.db.add_scores(
+            "game_id",
+            [
+                ("p1_id", "player1", 1, 5000),
+                ("p1_id", "player1", 2, 100),
+                ("p2_id", "player2", 1, 4000),
+                ("p2_id", "player2", 2, 300),
+            ],
+        )
+        self.analytics = ScoreAnalytics()
+        self.assertEqual(self.analytics.refresh(self.db), 4)
+
+    def tearDown(self):
+        self.conn.close()
+        self.print_patcher.stop()
+
+    def test_refresh_only_loads_new_rows(self):
+        self.assertEqual(self.analytics.refresh(self.db), 0)
+
+        self.db.add_game("game_id2")
+        self.db.add_scores("game_id2", [("p1_id", "player1", 1, 2500), ("p2_id", "player2", 1, 1500)])
+
+        self.assertEqual(self.analytics.refresh(self.db), 2)
+        self.assertEqual(self.analytics.scores.tolist(), [5000, 100, 4000, 300, 2500, 1500])
+        self.assertEqual(self.analytics.game_ids, ["game_id", "game_id2"])
+
+    def test_histogram_and_percentiles(self):
+        counts, edges = self.analytics.histogram(bins=5)
+
+        self.assertEqual(counts.tolist(), [2, 0, 0, 0, 2])
+        self.assertEqual(edges.tolist(), [0, 1000, 2000, 3000, 4000, 5000])
+        self.assertEqual(self.analytics.percentiles()[2], 2150)
+
+    def test_hardest_rounds(self):
+        self.assertEqual(
+            self.analytics.hardest_rounds(),
+            [("game_id", 2, 200.0, 2), ("game_id", 1, 4500.0, 2)],
+        )
+
+    def test_player_percentile_and_consistency(self):
+        player_ids = {name: player_id for player_id, name in self.analytics.player_names.items()}
+
+        self.assertEqual(self.analytics.player_percentile(player_ids["player1"]), 100.0)
+        self.assertEqual(self.analytics.player_percentile(player_ids["player2"]), 0.0)
+        self.assertEqual(self.analytics.consistency(player_ids["player1"]), (5100.0, 0.0))
+
 
 class TestGameWorkWeekUpdate(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
@@ -207,6 +569,84 @@ class TestGameWorkWeekUpdate(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(fetched_ids, ["mon_game", "wed_game"])
         mock_sleep.assert_awaited_once_with(20)
 
+    @patch("geobot.game.asyncio.sleep", new_callable=AsyncMock)
+    @patch("geobot.game.fetch_game_scores", new_callable=AsyncMock)
+    @patch("geobot.game.datetime.datetime")
+    async def test_update_work_week_scores_batches_tracks_per_day(
+        self,
+        mock_datetime,
+        mock_fetch_game_scores,
+        mock_sleep,
+    ):
+        mock_datetime.now.return_value = datetime(2026, 3, 6, 20, 0, 0)
+
+        with self.db.db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO games (game_id, created_at, track) VALUES (?, ?, ?)",
+                [
+                    ("mon_world", "2026-03-02 05:00:00", "world"),
+                    ("mon_signs", "2026-03-02 05:00:00", "signs"),
+                    ("tue_world", "2026-03-03 05:00:00", "world"),
+                    ("tue_signs", "2026-03-03 05:00:00", "signs"),
+                ],
+            )
+            conn.commit()
+
+        await update_work_week_scores(self.db)
+
+        fetched_ids = [call.args[1] for call in mock_fetch_game_scores.await_args_list]
+        self.assertEqual(fetched_ids, ["mon_world", "mon_signs", "tue_world", "tue_signs"])
+        # Adding tracks does not add pauses, only days do
+        mock_sleep.assert_awaited_once_with(20)
+
+    @patch("geobot.game.create_game")
+    async def test_create_games_skips_tracks_created_today(self, mock_create_game):
+        mock_create_game.return_value = "https://www.geoguessr.com/challenge/signs_game"
+        today = datetime.now(ZoneInfo("Europe/Stockholm")).date()
+        self.db.add_game("world_game", track="world", challenge_day=today)
+        # A game added by hand today is not today's challenge
+        self.db.add_game("added_game", track="signs")
+
+        with patch.dict("os.environ", {"CHALLENGE_TRACKS": "world,signs"}):
+            results = await create_games(self.db)
+
+        self.assertEqual([track.name for track, _ in results], ["signs"])
+        mock_create_game.assert_called_once()
+        self.assertEqual(self.db.get_challenges(today), [("world_game", "world")])
+
+    @patch("geobot.game.fetch_game_scores", new_callable=AsyncMock)
+    async def test_update_todays_scores_fetches_every_track(self, mock_fetch_game_scores):
+        mock_fetch_game_scores.return_value = 3
+        self.db.add_game("world_game", track="world")
+        self.db.add_game("signs_game", track="signs")
+
+        self.assertEqual(await update_todays_scores(self.db), 6)
+
+        fetched_ids = sorted(call.args[1] for call in mock_fetch_game_scores.await_args_list)
+        self.assertEqual(fetched_ids, ["signs_game", "world_game"])
+
+
+class TestSessions(unittest.TestCase):
+    @patch.dict("os.environ", {"GEOGUESSR_NCFA": "token"})
+    @patch("geobot.game._sessions", [])
+    @patch("geobot.game._local", threading.local())
+    def test_each_thread_gets_its_own_session(self):
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(_get_authenticated_session())) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(_get_authenticated_session(), _get_authenticated_session())
+        self.assertEqual(sessions[0].cookies.get("_ncfa"), "token")
+
+        with patch("requests.Session.close") as mock_close:
+            close_sessions()
+        self.assertEqual(mock_close.call_count, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,14 +1,21 @@
+import sqlite3
 import sys
+import threading
 import unittest
-from datetime import datetime, time
+from datetime import date, datetime
 from pathlib import Path
 from typing import Any, cast
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 from zoneinfo import ZoneInfo
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
+import discord
+
 import geobot.bot as geobot_bot
+from geobot.db import Database
+
+STOCKHOLM = ZoneInfo("Europe/Stockholm")
 
 
 class FakeTextChannel:
@@ -16,25 +23,88 @@ class FakeTextChannel:
         self.send = AsyncMock()
 
 
+def make_guild(db: Any) -> Any:
+    return geobot_bot.GuildContext(1, 123, db)
+
+
+def make_ctx(message: Any = None) -> MagicMock:
+    ctx = MagicMock()
+    ctx.guild.id = 1
+    ctx.author.id = 1
+    ctx.channel.id = 2
+    ctx.send = AsyncMock(return_value=message)
+    return ctx
+
+
 class TestGeoBotTasks(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         self.print_patcher = patch("builtins.print")
         self.print_patcher.start()
+        # Every test starts without command cooldowns,
+        self.admission_patcher = patch.object(geobot_bot, "admission", geobot_bot.AdmissionControl())
+        self.admission_patcher.start()
+        # and without channels cached by earlier tests
+        self.outbox_patcher = patch.object(geobot_bot, "outbox", geobot_bot.Outbox(geobot_bot.bot, backoff=0))
+        self.outbox_patcher.start()
 
     async def asyncTearDown(self):
+        self.outbox_patcher.stop()
+        self.admission_patcher.stop()
         self.print_patcher.stop()
 
-    def test_set_time(self):
-        result = geobot_bot.set_time(6, 0)
-        tzinfo = result.tzinfo
+    @patch("geobot.bot.datetime", wraps=datetime)
+    async def test_scheduler_runs_each_due_job_once(self, mock_datetime):
+        create_job = AsyncMock()
+        fetch_job = AsyncMock()
+        first_guild = make_guild(MagicMock())
+        second_guild = geobot_bot.GuildContext(2, 456, MagicMock(), schedule={"create": "07:00"})
+        registry = Database(conn=sqlite3.connect(":memory:"), registry=True)
+
+        with (
+            patch.object(geobot_bot, "db", registry),
+            patch.object(geobot_bot, "guilds", {1: first_guild, 2: second_guild}),
+            patch.dict(geobot_bot.JOBS, {"create": create_job, "fetch": fetch_job}),
+        ):
+            # The first tick only starts tracking the jobs
+            mock_datetime.now.return_value = datetime(2026, 3, 5, 5, 59, 45, tzinfo=STOCKHOLM)
+            await geobot_bot.scheduler_task.coro()
+            mock_datetime.now.return_value = datetime(2026, 3, 5, 6, 0, 15, tzinfo=STOCKHOLM)
+            await geobot_bot.scheduler_task.coro()
+            mock_datetime.now.return_value = datetime(2026, 3, 5, 6, 0, 45, tzinfo=STOCKHOLM)
+            await geobot_bot.scheduler_task.coro()
+
+        create_job.assert_awaited_once_with(first_guild, [datetime(2026, 3, 5, 6, 0, tzinfo=STOCKHOLM)])
+        fetch_job.assert_not_awaited()
+
+    @patch("geobot.bot.datetime", wraps=datetime)
+    async def test_scheduler_catches_up_missed_runs_after_restart(self, mock_datetime):
+        jobs = {job: AsyncMock() for job in geobot_bot.JOBS}
+        guild = make_guild(MagicMock())
+        registry = Database(conn=sqlite3.connect(":memory:"), registry=True)
+        # Down from just before Tuesday's nightly fetch until Thursday morning
+        for job in jobs:
+            registry.record_job_run(1, job, datetime(2026, 3, 3, 23, 40, tzinfo=STOCKHOLM).isoformat())
+
+        events: list[str] = []
+        for job, mock_job in jobs.items():
+            mock_job.side_effect = lambda _guild, _runs, job=job: events.append(job)
 
-        self.assertIsInstance(result, time)
-        self.assertEqual(result.hour, 6)
-        self.assertEqual(result.minute, 0)
-        self.assertIsNotNone(tzinfo)
-        self.assertIsInstance(tzinfo, ZoneInfo)
-        if isinstance(tzinfo, ZoneInfo):
-            self.assertEqual(tzinfo.key, "Europe/Stockholm")
+        with (
+            patch.object(geobot_bot, "db", registry),
+            patch.object(geobot_bot, "guilds", {1: guild}),
+            patch.dict(geobot_bot.JOBS, jobs),
+        ):
+            mock_datetime.now.return_value = datetime(2026, 3, 5, 9, 0, tzinfo=STOCKHOLM)
+            await geobot_bot.scheduler_task.coro()
+            await geobot_bot.scheduler_task.coro()
+
+        # Each job runs once, covering all of its missed runs, and scores are fetched before they are posted
+        self.assertEqual(events, ["fetch", "post", "maintenance", "create", "weekly"])
+        fetch_runs = jobs["fetch"].await_args.args[1]
+        self.assertEqual([run.day for run in fetch_runs], [3, 4])
+        self.assertEqual(
+            set(registry.get_job_runs(1).values()), {datetime(2026, 3, 5, 9, 0, tzinfo=STOCKHOLM).isoformat()}
+        )
 
     @patch("geobot.bot.update_work_week_scores", new_callable=AsyncMock)
     @patch("geobot.bot.datetime")
@@ -45,17 +115,15 @@ class TestGeoBotTasks(unittest.IsolatedAsyncioTestCase):
     ):
         mock_datetime.now.return_value = datetime(2026, 3, 5, 20, 0, 0)
 
-        await geobot_bot.post_week_leaderboard.coro()
+        await geobot_bot.post_week_leaderboard_job(make_guild(MagicMock()), [datetime(2026, 3, 5, 20, 0, 0)])
 
         mock_update_work_week_scores.assert_not_awaited()
 
     @patch("geobot.bot.discord.TextChannel", FakeTextChannel)
     @patch("geobot.bot.update_work_week_scores", new_callable=AsyncMock)
     @patch("geobot.bot.datetime")
-    @patch("geobot.bot.os.getenv", return_value="123")
     async def test_weekly_post_refreshes_then_posts_scores(
         self,
-        _mock_getenv,
         mock_datetime,
         mock_update_work_week_scores,
     ):
@@ -79,27 +147,160 @@ class TestGeoBotTasks(unittest.IsolatedAsyncioTestCase):
 
         fake_db = MagicMock()
         fake_db.get_scores_rows.side_effect = get_scores_side_effect
+        fake_db.was_posted.return_value = False
 
-        with (
-            patch.object(geobot_bot, "db", fake_db),
-            patch.object(
-                geobot_bot.bot,
-                "fetch_channel",
-                AsyncMock(return_value=channel),
-            ),
+        with patch.object(
+            geobot_bot.bot,
+            "fetch_channel",
+            AsyncMock(return_value=channel),
         ):
-            await geobot_bot.post_week_leaderboard.coro()
+            await geobot_bot.post_week_leaderboard_job(make_guild(fake_db), [datetime(2026, 3, 6, 20, 0, 0)])
 
         mock_update_work_week_scores.assert_awaited_once_with(fake_db)
         fake_db.get_scores_rows.assert_called_once_with(period="week", sort_by_avg=False)
         channel.send.assert_awaited_once()
         self.assertEqual(events, ["refresh", "scores", "send"])
 
+    @patch("geobot.bot.update_scores_between", new_callable=AsyncMock)
+    async def test_fetch_job_updates_the_scheduled_days(self, mock_update_scores_between):
+        fake_db = MagicMock()
+        runs = [datetime(2026, 3, 4, 23, 45, tzinfo=STOCKHOLM), datetime(2026, 3, 5, 23, 45, tzinfo=STOCKHOLM)]
+        await geobot_bot.fetch_scores_job(make_guild(fake_db), runs)
+
+        mock_update_scores_between.assert_awaited_once_with(fake_db, date(2026, 3, 4), date(2026, 3, 5))
+
+    @patch("geobot.bot.discord.TextChannel", FakeTextChannel)
+    @patch("geobot.bot.create_games", new_callable=AsyncMock)
+    @patch("geobot.bot.datetime", wraps=datetime)
+    async def test_create_job_announces_games_an_earlier_run_failed_to_announce(self, mock_datetime, mock_create_games):
+        mock_datetime.now.return_value = datetime(2026, 3, 5, 6, 0, 15, tzinfo=STOCKHOLM)
+        run = [datetime(2026, 3, 5, 6, 0, tzinfo=STOCKHOLM)]
+        guild_db = Database(conn=sqlite3.connect(":memory:"))
+        track = geobot_bot.TRACKS[geobot_bot.DEFAULT_TRACK]
+        # Backfilled with !add_game, not a challenge to announce
+        guild_db.add_game("old", created_at="2026-03-05 05:00:00", track=track.name)
+
+        async def create_side_effect(db, _tracks):
+            db.add_game("game", created_at="2026-03-05 06:00:00", track=track.name, challenge_day=date(2026, 3, 5))
+            return [(track, "https://www.geoguessr.com/challenge/game")]
+
+        mock_create_games.side_effect = create_side_effect
+        channel = FakeTextChannel()
+        channel.send.side_effect = discord.HTTPException(MagicMock(status=400), "Bad Request")
+
+        with patch.object(geobot_bot.bot, "fetch_channel", AsyncMock(return_value=channel)):
+            with self.assertRaises(discord.HTTPException):
+                await geobot_bot.create_game_job(make_guild(guild_db), run)
+
+            # The repeated run finds the game already created
+            mock_create_games.side_effect = None
+            mock_create_games.return_value = []
+            channel.send.side_effect = None
+            await geobot_bot.create_game_job(make_guild(guild_db), run)
+            await geobot_bot.create_game_job(make_guild(guild_db), run)
+
+        self.assertEqual(channel.send.await_count, 2)
+        self.assertEqual(channel.send.await_args.kwargs["content"], "https://www.geoguessr.com/challenge/game")
+
+    @patch("geobot.bot.discord.TextChannel", FakeTextChannel)
+    async def test_daily_post_is_not_repeated_for_the_same_day(self):
+        guild_db = Database(conn=sqlite3.connect(":memory:"))
+        guild_db.add_game("game", created_at="2026-03-05 12:00:00")
+        guild_db.add_scores("game", [("p1_id", "player1", 1, 4000)])
+        run = [datetime(2026, 3, 5, 23, 59, tzinfo=STOCKHOLM)]
+        channel = FakeTextChannel()
+
+        with patch.object(geobot_bot.bot, "fetch_channel", AsyncMock(return_value=channel)):
+            await geobot_bot.post_daily_scores_job(make_guild(guild_db), run)
+            await geobot_bot.post_daily_scores_job(make_guild(guild_db), run)
+
+        channel.send.assert_awaited_once()
+        self.assertTrue(guild_db.was_posted("daily", "2026-03-05"))
+
+    @patch("geobot.bot.datetime", wraps=datetime)
+    async def test_weekly_post_is_caught_up_later_the_same_week(self, mock_datetime):
+        friday_run = [datetime(2026, 3, 6, 20, 0, tzinfo=STOCKHOLM)]
+        fake_db = MagicMock()
+        fake_db.get_scores_rows.return_value = []
+        fake_db.was_posted.return_value = False
+
+        with patch("geobot.bot.update_work_week_scores", new_callable=AsyncMock) as mock_update_work_week_scores:
+            mock_datetime.now.return_value = datetime(2026, 3, 9, 9, 0, tzinfo=STOCKHOLM)
+            await geobot_bot.post_week_leaderboard_job(make_guild(fake_db), friday_run)
+            mock_update_work_week_scores.assert_not_awaited()
+
+            channel = FakeTextChannel()
+            with (
+                patch("geobot.bot.discord.TextChannel", FakeTextChannel),
+                patch.object(geobot_bot.bot, "fetch_channel", AsyncMock(return_value=channel)),
+            ):
+                mock_datetime.now.return_value = datetime(2026, 3, 8, 9, 0, tzinfo=STOCKHOLM)
+                await geobot_bot.post_week_leaderboard_job(make_guild(fake_db), friday_run)
+            mock_update_work_week_scores.assert_awaited_once_with(fake_db)
+
+    @patch("geobot.bot.discord.TextChannel", FakeTextChannel)
     @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
-    async def test_fetch_todays_task_updates_today_only(self, mock_update_todays_scores):
-        await geobot_bot.fetch_todays_scores_task.coro()
+    async def test_live_poll_edits_message_only_when_ranking_changes(self, mock_update_todays_scores):
+        channel = FakeTextChannel()
+        message = AsyncMock()
+        channel.send.return_value = message
 
-        mock_update_todays_scores.assert_awaited_once_with(geobot_bot.db)
+        fake_db = MagicMock()
+        fake_db.get_latest_games.return_value = [("game", "world")]
+        fake_db.get_scores_rows.return_value = [("player", 12345, 2, 0)]
+        mock_update_todays_scores.return_value = 5
+
+        guild = make_guild(fake_db)
+        with patch.object(geobot_bot.bot, "fetch_channel", AsyncMock(return_value=channel)):
+            await geobot_bot.live_poll_job(guild, 0.0)
+            await geobot_bot.live_poll_job(guild, 60.0)
+            fake_db.get_scores_rows.return_value = [("player2", 15000, 3, 0), ("player", 12345, 2, 0)]
+            await geobot_bot.live_poll_job(guild, 120.0)
+
+        self.assertGreater(guild.next_poll_at, 120.0)
+        channel.send.assert_awaited_once()
+        message.edit.assert_awaited_once()
+        fake_db.get_scores_rows.assert_called_with(period="today")
+
+    @patch("geobot.bot.discord.TextChannel", FakeTextChannel)
+    @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
+    async def test_live_poll_posts_new_message_when_old_one_is_deleted(self, mock_update_todays_scores):
+        channel = FakeTextChannel()
+        message = AsyncMock()
+        message.edit.side_effect = discord.NotFound(MagicMock(status=404), "Unknown Message")
+        channel.send.return_value = message
+
+        fake_db = MagicMock()
+        fake_db.get_latest_games.return_value = [("game", "world")]
+        fake_db.get_scores_rows.return_value = [("player", 12345, 2, 0)]
+        mock_update_todays_scores.return_value = 5
+
+        guild = make_guild(fake_db)
+        with patch.object(geobot_bot.bot, "fetch_channel", AsyncMock(return_value=channel)):
+            await geobot_bot.live_poll_job(guild, 0.0)
+            fake_db.get_scores_rows.return_value = [("player2", 15000, 3, 0), ("player", 12345, 2, 0)]
+            await geobot_bot.live_poll_job(guild, 60.0)
+            self.assertIsNone(guild.live_board.message)
+            await geobot_bot.live_poll_job(guild, 120.0)
+
+        self.assertEqual(channel.send.await_count, 2)
+        self.assertIs(guild.live_board.message, message)
+
+    @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
+    async def test_live_poll_charges_budget_per_track(self, mock_update_todays_scores):
+        fake_db = MagicMock()
+        fake_db.get_latest_games.return_value = [("game1", "world"), ("game2", "sweden"), ("game3", "europe")]
+        fake_db.get_scores_rows.return_value = []
+        mock_update_todays_scores.return_value = 0
+
+        guild = make_guild(fake_db)
+        guild.poller.daily_budget = 5
+        await geobot_bot.live_poll_job(guild, 0.0)
+        await geobot_bot.live_poll_job(guild, 60.0)
+
+        self.assertEqual(guild.poller.calls_today, 3)
+        mock_update_todays_scores.assert_awaited_once()
+        self.assertEqual(guild.next_poll_at, 60.0 + guild.poller.max_interval)
 
     @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
     @patch("geobot.bot.update_work_week_scores", new_callable=AsyncMock)
@@ -109,22 +310,21 @@ class TestGeoBotTasks(unittest.IsolatedAsyncioTestCase):
         mock_update_todays_scores,
     ):
         message = AsyncMock()
-        ctx = MagicMock()
-        ctx.send = AsyncMock(return_value=message)
+        ctx = make_ctx(message)
 
         fake_db = MagicMock()
         fake_db.get_scores_rows.return_value = [("player", 12345, 3, 4115, 2, 0)]
         leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
 
-        with patch.object(geobot_bot, "db", fake_db):
+        with patch.object(geobot_bot, "guilds", {1: make_guild(fake_db)}):
             await leaderboard_callback(ctx, "week")
 
         mock_update_work_week_scores.assert_awaited_once_with(fake_db)
         mock_update_todays_scores.assert_not_awaited()
         fake_db.get_scores_rows.assert_called_once_with(
-            game_id=None,
             period="week",
             sort_by_avg=False,
+            track=None,
         )
 
     @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
@@ -135,24 +335,180 @@ class TestGeoBotTasks(unittest.IsolatedAsyncioTestCase):
         mock_update_todays_scores,
     ):
         message = AsyncMock()
-        ctx = MagicMock()
-        ctx.send = AsyncMock(return_value=message)
+        ctx = make_ctx(message)
 
         fake_db = MagicMock()
         fake_db.get_scores_rows.return_value = [("player", 12345, 3, 4115, 2, 0)]
         leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
 
-        with patch.object(geobot_bot, "db", fake_db):
+        with patch.object(geobot_bot, "guilds", {1: make_guild(fake_db)}):
             await leaderboard_callback(ctx)
 
         mock_update_todays_scores.assert_awaited_once_with(fake_db)
         mock_update_work_week_scores.assert_not_awaited()
         fake_db.get_scores_rows.assert_called_once_with(
-            game_id=None,
             period=None,
             sort_by_avg=False,
+            track=None,
+        )
+
+    @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
+    async def test_leaderboard_rating_skips_refresh(self, mock_update_todays_scores):
+        ctx = make_ctx()
+
+        fake_db = MagicMock()
+        fake_db.get_ratings_rows.return_value = [("player", 1532.4, 3, 1, 2, 21000)]
+        leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
+
+        with patch.object(geobot_bot, "guilds", {1: make_guild(fake_db)}):
+            await leaderboard_callback(ctx, "rating")
+
+        mock_update_todays_scores.assert_not_awaited()
+        fake_db.get_scores_rows.assert_not_called()
+        embed = ctx.send.await_args.kwargs["embed"]
+        self.assertIn("1532", embed.description)
+
+    @patch("geobot.bot.update_todays_scores", new_callable=AsyncMock)
+    async def test_leaderboard_busy_replies_with_cached_board(self, mock_update_todays_scores):
+        message = AsyncMock()
+        ctx = make_ctx(message)
+
+        fake_db = MagicMock()
+        fake_db.get_scores_rows.return_value = [("player", 12345, 3, 4115, 2, 0)]
+        leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
+
+        with patch.object(geobot_bot, "guilds", {1: make_guild(fake_db)}):
+            await leaderboard_callback(ctx)
+            await leaderboard_callback(ctx)
+
+        mock_update_todays_scores.assert_awaited_once_with(fake_db)
+        cached_embed = message.edit.await_args.kwargs["embed"]
+        self.assertIs(ctx.send.await_args.kwargs["embed"], cached_embed)
+
+    async def test_leaderboard_releases_admission_when_status_send_fails(self):
+        ctx = make_ctx()
+        ctx.send.side_effect = OSError("connection reset")
+        leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
+
+        admission = geobot_bot.AdmissionControl(user_cooldown=0, channel_cooldown=0)
+        with (
+            patch.object(geobot_bot, "guilds", {1: make_guild(MagicMock())}),
+            patch.object(geobot_bot, "admission", admission),
+        ):
+            for _ in range(3):
+                with self.assertRaises(OSError):
+                    await leaderboard_callback(ctx)
+
+        self.assertEqual(admission.active, 0)
+        self.assertEqual(ctx.send.await_count, 3)
+        self.assertTrue(ctx.send.await_args.args[0].startswith("Fetching"))
+
+    async def test_maintenance_runs_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads: list[int] = []
+        fake_db = MagicMock()
+        fake_db.roll_season_if_due.side_effect = lambda: threads.append(threading.get_ident())
+        fake_db.run_maintenance.side_effect = lambda: threads.append(threading.get_ident())
+
+        await geobot_bot.maintenance_job(make_guild(fake_db), [datetime(2026, 3, 5, 4, 0, tzinfo=STOCKHOLM)])
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_every_process_picks_up_guilds_set_up_by_another_process(self):
+        registry = Database(conn=sqlite3.connect(":memory:"), registry=True)
+        registry.upsert_guild(1, 123, data_dir="")
+        registry.acquire_lease(geobot_bot.LEADER_LEASE, "other-process", geobot_bot.LEASE_TTL_SECONDS)
+        loaded: dict[int, Any] = {}
+
+        with (
+            patch.object(geobot_bot, "db", registry),
+            patch.object(geobot_bot, "guilds", loaded),
+            patch.object(geobot_bot, "SCHEDULED_TASKS", []),
+        ):
+            await geobot_bot.leadership_task.coro()
+            registry.set_guild_tracks(1, "signs")
+            await geobot_bot.leadership_task.coro()
+
+        self.assertEqual(list(loaded), [1])
+        self.assertEqual(loaded[1].tracks, "signs")
+
+    async def test_command_reloads_guilds_it_does_not_know_yet(self):
+        registry = Database(conn=sqlite3.connect(":memory:"), registry=True)
+        registry.upsert_guild(1, 123, data_dir="")
+        loaded: dict[int, Any] = {}
+
+        with patch.object(geobot_bot, "db", registry), patch.object(geobot_bot, "guilds", loaded):
+            guild = await geobot_bot._get_guild(make_ctx())
+
+        self.assertIs(guild, loaded[1])
+
+    async def test_leaderboard_asks_for_setup_in_unknown_guild(self):
+        ctx = make_ctx()
+        leaderboard_callback = cast(Any, geobot_bot.leaderboard.callback)
+
+        with patch.object(geobot_bot, "guilds", {}):
+            await leaderboard_callback(ctx)
+
+        self.assertIn("!setup", ctx.send.await_args.args[0])
+
+    async def test_leadership_starts_and_stops_scheduled_tasks(self):
+        task = MagicMock()
+        task.coro.__name__ = "scheduled_task"
+        task.is_running.return_value = False
+        task.is_being_cancelled.return_value = False
+
+        fake_db = MagicMock()
+        fake_db.acquire_lease.return_value = True
+
+        with (
+            patch.object(geobot_bot, "db", fake_db),
+            patch.object(geobot_bot, "SCHEDULED_TASKS", [task]),
+        ):
+            await geobot_bot.leadership_task.coro()
+            task.start.assert_called_once()
+
+            task.is_running.return_value = True
+            fake_db.acquire_lease.return_value = False
+            await geobot_bot.leadership_task.coro()
+            task.cancel.assert_called_once()
+
+        fake_db.acquire_lease.assert_called_with(
+            geobot_bot.LEADER_LEASE,
+            geobot_bot.instance_id,
+            geobot_bot.LEASE_TTL_SECONDS,
+            now=ANY,
         )
 
+    @patch("geobot.bot.time")
+    async def test_leadership_survives_failed_renewals_until_the_lease_expires(self, mock_time):
+        task = MagicMock()
+        task.coro.__name__ = "scheduled_task"
+        task.is_running.return_value = False
+        task.is_being_cancelled.return_value = False
+
+        fake_db = MagicMock()
+        fake_db.acquire_lease.return_value = True
+
+        with (
+            patch.object(geobot_bot, "db", fake_db),
+            patch.object(geobot_bot, "SCHEDULED_TASKS", [task]),
+            patch.object(geobot_bot, "lease_renewed_at", None),
+        ):
+            mock_time.time.return_value = 1000.0
+            await geobot_bot.leadership_task.coro()
+            task.start.assert_called_once()
+            task.is_running.return_value = True
+
+            fake_db.acquire_lease.side_effect = sqlite3.OperationalError("database is locked")
+            mock_time.time.return_value = 1000.0 + geobot_bot.LEASE_TTL_SECONDS - 1
+            await geobot_bot.leadership_task.coro()
+            task.cancel.assert_not_called()
+
+            mock_time.time.return_value = 1000.0 + geobot_bot.LEASE_TTL_SECONDS
+            await geobot_bot.leadership_task.coro()
+            task.cancel.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.guilds import DEFAULT_SCHEDULE, MAX_CATCH_UP, GuildContext, due_jobs, parse_time
+
+STOCKHOLM = ZoneInfo("Europe/Stockholm")
+
+
+class TestDueJobs(unittest.TestCase):
+    def test_job_is_due_once_when_its_time_is_passed(self):
+        schedule = {"create": "06:00", "post": "23:59"}
+        before = datetime(2026, 3, 5, 5, 59, 40, tzinfo=STOCKHOLM)
+        after = datetime(2026, 3, 5, 6, 0, 10, tzinfo=STOCKHOLM)
+        later = datetime(2026, 3, 5, 6, 0, 40, tzinfo=STOCKHOLM)
+
+        self.assertEqual(
+            due_jobs(schedule, {"create": before, "post": before}, after),
+            {"create": [datetime(2026, 3, 5, 6, 0, tzinfo=STOCKHOLM)]},
+        )
+        self.assertEqual(due_jobs(schedule, {"create": after, "post": before}, later), {})
+
+    def test_missed_runs_are_collected_oldest_job_first(self):
+        schedule = {"create": "06:00", "fetch": "23:45", "post": "23:59"}
+        down_since = datetime(2026, 3, 3, 23, 50, tzinfo=STOCKHOLM)
+        now = datetime(2026, 3, 5, 12, 0, tzinfo=STOCKHOLM)
+        last_runs = {"create": down_since, "fetch": down_since, "post": down_since}
+
+        due = due_jobs(schedule, last_runs, now)
+
+        self.assertEqual(list(due), ["post", "create", "fetch"])
+        self.assertEqual([run.day for run in due["post"]], [3, 4])
+        self.assertEqual([run.day for run in due["create"]], [4, 5])
+        self.assertEqual([run.day for run in due["fetch"]], [4])
+
+    def test_catch_up_is_limited_and_new_jobs_are_not_due(self):
+        now = datetime(2026, 3, 31, 12, 0, tzinfo=STOCKHOLM)
+        last_runs = {"create": datetime(2026, 1, 1, tzinfo=STOCKHOLM)}
+
+        due = due_jobs({"create": "06:00", "post": "23:59"}, last_runs, now)
+
+        self.assertEqual(list(due), ["create"])
+        self.assertEqual(len(due["create"]), MAX_CATCH_UP.days)
+
+    def test_parse_time_rejects_malformed_values(self):
+        self.assertEqual(parse_time("06:30").minute, 30)
+        for value in ["6", "25:00", "06:00:00", "six"]:
+            with self.assertRaises(ValueError):
+                parse_time(value)
+
+
+class TestGuildContext(unittest.TestCase):
+    def test_schedule_overrides_defaults(self):
+        guild = GuildContext(1, 2, db=None, schedule={"create": "07:00"})  # type: ignore[arg-type]
+
+        self.assertEqual(guild.schedule["create"], "07:00")
+        self.assertEqual(guild.schedule["post"], DEFAULT_SCHEDULE["post"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.db import Database
+from geobot.game import fetch_games_scores
+from geobot.ingest import ScoreIngest
+from geobot.responses import ResponseStore
+
+
+class TestScoreIngest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+        # The writer commits from a worker thread, so the databases are files rather than shared connections
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.db = Database(
+            path=os.path.join(self.data_dir.name, "database.db"),
+            archive_dir=os.path.join(self.data_dir.name, "archive"),
+            responses=ResponseStore(os.path.join(self.data_dir.name, "responses.db")),
+        )
+
+    async def asyncTearDown(self):
+        self.data_dir.cleanup()
+        self.print_patcher.stop()
+
+    async def test_concurrent_games_share_one_commit(self):
+        async with ScoreIngest(self.db, max_delay=1.0) as ingest:
+            await asyncio.gather(
+                *(
+                    ingest.put(f"game_{i}", [[("p1_id", "player1", 1, 1000 * i)], [("p2_id", "player2", 1, 10)]], b"{}")
+                    for i in range(5)
+                )
+            )
+
+        self.assertEqual(ingest.commits, 1)
+        self.assertEqual(ingest.new_rows, 10)
+        assert self.db.responses is not None
+        self.assertEqual(len(list(self.db.responses.latest("highscores"))), 5)
+
+    async def test_full_batch_is_committed_without_waiting(self):
+        async with ScoreIngest(self.db, max_games=2, max_delay=60.0, max_queue=1) as ingest:
+            for i in range(4):
+                await ingest.put(f"game_{i}", [[("p1_id", "player1", 1, 5000)]])
+
+        self.assertEqual(ingest.commits, 2)
+        self.assertEqual(ingest.new_rows, 4)
+
+    @patch.dict(os.environ, {"GEOGUESSR_NCFA": "token"})
+    async def test_fetch_games_scores_counts_committed_rows(self):
+        def get(url):
+            game_id = url.rsplit("/", 1)[1]
+            response = MagicMock()
+            response.content = game_id.encode()
+            response.json.return_value = {
+                "items": [
+                    {"game": {"player": {"id": "p1_id", "nick": "player1", "guesses": [{"roundScoreInPoints": 100}]}}}
+                ]
+            }
+            return response
+
+        session = MagicMock()
+        session.get.side_effect = get
+
+        with patch("geobot.game._get_authenticated_session", return_value=session):
+            self.assertEqual(await fetch_games_scores(self.db, ["game_1", "game_2", "game_3"]), 3)
+            self.assertEqual(await fetch_games_scores(self.db, ["game_1"]), 0)
+
+        self.assertEqual(len(self.db.get_score_rows_since(0, include_archived=False)), 3)
+
+    @patch.dict(os.environ, {"GEOGUESSR_NCFA": "token"})
+    async def test_failed_game_does_not_drop_the_others(self):
+        def get(url):
+            game_id = url.rsplit("/", 1)[1]
+            response = MagicMock()
+            response.content = game_id.encode()
+            if game_id == "broken":
+                response.json.side_effect = ValueError("not json")
+            else:
+                response.json.return_value = {
+                    "items": [
+                        {"game": {"player": {"id": "p1_id", "nick": "player1", "guesses": [{"roundScoreInPoints": 1}]}}}
+                    ]
+                }
+            return response
+
+        session = MagicMock()
+        session.get.side_effect = get
+
+        with patch("geobot.game._get_authenticated_session", return_value=session):
+            self.assertEqual(await fetch_games_scores(self.db, ["game_1", "broken", "game_2"]), 2)
+
+        # The unparsable response is still archived for a later replay
+        assert self.db.responses is not None
+        self.assertEqual(
+            sorted(key for key, _, _ in self.db.responses.latest("highscores")), ["broken", "game_1", "game_2"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
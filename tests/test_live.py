@@ -0,0 +1,56 @@
+import sys
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.live import AdaptivePoller, LiveBoard
+
+
+class TestAdaptivePoller(unittest.TestCase):
+    def test_backs_off_until_new_results_arrive(self):
+        poller = AdaptivePoller(min_interval=60, max_interval=300, backoff=2)
+
+        self.assertEqual(poller.record(0), 120)
+        self.assertEqual(poller.record(0), 240)
+        self.assertEqual(poller.record(0), 300)
+        self.assertEqual(poller.record(3), 60)
+
+    def test_daily_budget_resets_next_day(self):
+        poller = AdaptivePoller(daily_budget=2)
+
+        self.assertTrue(poller.try_acquire(date(2026, 3, 6)))
+        self.assertTrue(poller.try_acquire(date(2026, 3, 6)))
+        self.assertFalse(poller.try_acquire(date(2026, 3, 6)))
+        self.assertTrue(poller.try_acquire(date(2026, 3, 7)))
+
+    def test_budget_counts_every_track_polled(self):
+        poller = AdaptivePoller(daily_budget=5)
+
+        self.assertTrue(poller.try_acquire(date(2026, 3, 6), calls=2))
+        self.assertTrue(poller.try_acquire(date(2026, 3, 6), calls=2))
+        self.assertFalse(poller.try_acquire(date(2026, 3, 6), calls=2))
+        self.assertTrue(poller.try_acquire(date(2026, 3, 6)))
+        self.assertEqual(poller.calls_today, 5)
+
+
+class TestLiveBoard(unittest.TestCase):
+    def test_only_changed_ranking_needs_render(self):
+        board = LiveBoard()
+
+        self.assertTrue(board.update("game", [("player1", 5000, 1, 0)]))
+        self.assertFalse(board.update("game", [("player1", 5000, 1, 0)]))
+        self.assertTrue(board.update("game", [("player2", 6000, 1, 0), ("player1", 5000, 1, 0)]))
+
+    def test_new_game_resets_message(self):
+        board = LiveBoard()
+        board.update("game", [("player1", 5000, 1, 0)])
+        board.message = object()
+
+        self.assertTrue(board.update("game2", [("player1", 5000, 1, 0)]))
+        self.assertIsNone(board.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
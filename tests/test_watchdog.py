@@ -0,0 +1,48 @@
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from geobot.watchdog import LoopWatchdog
+
+
+def blocking_call() -> None:
+    time.sleep(0.3)
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.print_patcher = patch("builtins.print")
+        self.mock_print = self.print_patcher.start()
+
+        self.watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+        self.watchdog.start(asyncio.get_running_loop())
+
+    async def asyncTearDown(self):
+        self.watchdog.stop()
+        self.print_patcher.stop()
+
+    async def test_reports_blocking_call_site_once_per_block(self):
+        blocking_call()
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(len(self.watchdog.counts), 1)
+        site, count = self.watchdog.counts.most_common(1)[0]
+        self.assertIn("blocking_call", site)
+        self.assertEqual(count, 1)
+        logged = "\n".join(str(call.args[0]) for call in self.mock_print.call_args_list)
+        self.assertIn("time.sleep(0.3)", logged)
+
+    async def test_does_not_report_when_loop_yields(self):
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+
+        self.assertEqual(len(self.watchdog.counts), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()